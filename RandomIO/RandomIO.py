@@ -21,112 +21,330 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import io
 import os
+import atexit
+import threading
+import struct
+import hashlib
+
+from collections import deque, OrderedDict
 
-from Crypto.Cipher import AES
-from Crypto.Hash import SHA256
-from Crypto.Util import Counter
 from binascii import hexlify
 
+from . import backends
+from . import cache as keystream_cache
+from . import metrics
+from . import rng
+from .view import RandomView
+
 
-class RandomIO(object):
+class RandomIO(io.RawIOBase):
 
-    def __init__(self, seed=None, size=None):
+    def __init__(self, seed=None, size=None, backend=None, cache=None):
         """Initialization method
 
         :param seed: an object to use as the seed for the random number,
         generation.  should be hashable object
         :param size: the maximum size of the stream
+        :param backend: the name of the keystream backend to use, or a
+            backend instance.  if none, the fastest available backend is used
+        :param cache: a KeystreamCache for read() and seek() to consult
+            before running the cipher, or True for the cache shared by the
+            whole process.  off by default
         """
-        self.blocksize = 16
-        self.ctrblocksize = self.blocksize // 2
-        self.ctr = Counter.new(self.blocksize * 8)
+        self._setup(size, backend, cache)
         if (seed is None):
-            seed = os.urandom(32)
-        try:
-            self.key = SHA256.new(seed).digest()
-        except TypeError:
-            self.key = SHA256.new(str(seed).encode()).digest()
-        self.aes = AES.new(self.key, AES.MODE_CTR, counter=self.ctr)
-        self.bufsz = 65536
-        self.bufpos = 0
-        self.buffer = bytes()
+            self._set_key(_derive_key(os.urandom(32)))
+        else:
+            self._set_key(_seed_key(seed))
+
+    @classmethod
+    def from_key(cls, key, size=None, backend=None, cache=None):
+        """Returns a stream for a key that was already derived from a seed,
+        such as the key attribute of another stream, skipping derivation.
+
+        :param key: the 32 byte cipher key
+        :param size: the maximum size of the stream
+        :param backend: the keystream backend, as for RandomIO()
+        :param cache: a KeystreamCache, as for RandomIO()
+        :returns: a RandomIO stream
+        """
+        stream = cls.__new__(cls)
+        stream._setup(size, backend, cache)
+        stream._set_key(key)
+        return stream
+
+    def _setup(self, size, backend, cache):
+        io.RawIOBase.__init__(self)
+        self.blocksize = 16
+        # positional reads spanning at most this many cipher blocks encrypt
+        # the counter blocks directly with self.ecb, larger ones are cheaper
+        # with a fresh CTR cipher
+        self.ecbblocks = 32
+        # default write size for dump() and genfile(), from the serial
+        # dump benchmark; larger sizes gain nothing
+        self.bufsz = 1048576
+        # size of the ranges handed to each worker in parallel mode
+        self.chunksz = 4194304
+        # reads smaller than this are served from a read-ahead buffer, so
+        # small reads do not each pay for a cipher call.  the buffer starts
+        # at one cipher block after a seek and doubles with every refill
+        # up to this size, so random reads do not generate bytes that are
+        # never used
+        self.readahead = 4096
         self.offset = 0
         self.size = size
+        self.backend = backends.get(backend)
+        if (cache is True):
+            cache = keystream_cache.shared()
+        self.cache = cache or None
+
+    def _set_key(self, key):
+        """Sets up the ciphers for a derived key and rewinds the stream.
+        """
+        self.key = key
+        # a single expanded key for positional reads.  ECB has no chaining
+        # state, so the same object is shared between threads and between
+        # streams for the same key
+        self.ecb = _key_schedule(self.backend, key)
+        self.aes = self.backend.ctr(self.key, 0, self.ecb)
+        self._drop_ahead()
+        self.offset = 0
+
+    def _drop_ahead(self):
+        """Empties the read-ahead buffer.  self.aes is always positioned
+        at the end of the buffer, which is the stream offset once it is
+        empty.
+        """
+        self._ahead = b''
+        self._pos = 0
+        self._window = self.blocksize
+
+    def close(self):
+        self._drop_ahead()
+        io.RawIOBase.close(self)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
 
     def _read_raw(self, size):
         """Reads directly from the random stream"""
-        return self.aes.encrypt('\0' * size)
-
-    def _clear_buffer(self):
-        self.buffer = bytes()
-        self.bufpos = 0
-
-    def _fill_buffer(self):
-        # refill the buffer
-        self.buffer = self._read_raw(self.ctrblocksize)
-        self.bufpos = 0
-
-    def _seek_buffer(self, offset):
-        self.bufpos = offset
-
-    def _read_buffer(self, size):
-        """This reads size bytes from the buffer.
-        Will not read more than the size of the buffer in bytes,
-        so may return less than size bytes
-        """
-        remaining = len(self.buffer) - self.bufpos
-        if (size < remaining):
-            # we can read directly from the buffer
-            ret = self.buffer[self.bufpos:self.bufpos + size]
-            self.bufpos += len(ret)
-            size -= len(ret)
+        if (metrics.enabled):
+            return metrics.call('cipher', size, self.aes.keystream, size)
+        return self.aes.keystream(size)
+
+    def _read_raw_into(self, view, aes=None):
+        """Writes len(view) bytes from the random stream directly into view.
+
+        :param view: a writable byte memoryview
+        :param aes: the keystream to draw from, defaults to the stream's own
+        """
+        if (aes is None):
+            aes = self.aes
+        if (metrics.enabled):
+            metrics.call('cipher', len(view), aes.keystream_into, view)
         else:
-            ret = self.buffer[self.bufpos:]
-            self.bufpos += len(ret)
-            size -= len(ret)
+            aes.keystream_into(view)
 
+    def _refill(self, size):
+        """Returns how many bytes to refill the read-ahead buffer with for a
+        read of size bytes, and grows the window for the next refill
+        """
+        if (metrics.enabled):
+            metrics.count('refills')
+        n = max(size, self._window)
+        self._window = min(2 * self._window, self.readahead)
+        return n
+
+    def _read_ahead(self, size):
+        """Returns the next size bytes of the sequential keystream, starting
+        with what is left in the read-ahead buffer.  Small reads refill the
+        buffer, larger ones go straight to the cipher.
+        """
+        pos = self._pos
+        end = pos + size
+        ahead = self._ahead
+        if (end <= len(ahead)):
+            self._pos = end
+            return ahead[pos:end]
+        rest = ahead[pos:]
+        size -= len(rest)
+        if (size < self.readahead):
+            self._ahead = ahead = self._read_raw(self._refill(size))
+            self._pos = size
+            return rest + ahead[:size]
+        self._drop_ahead()
+        if (len(rest) < 1):
+            return self._read_raw(size)
+        return rest + self._read_raw(size)
+
+    def _read_ahead_into(self, view):
+        """Writes the next len(view) bytes of the sequential keystream into
+        view, as _read_ahead() does
+        """
+        pos = self._pos
+        n = min(len(view), len(self._ahead) - pos)
+        if (n > 0):
+            view[:n] = memoryview(self._ahead)[pos:pos + n]
+            self._pos = pos + n
+            view = view[n:]
+        if (len(view) < 1):
+            return
+        if (len(view) < self.readahead):
+            self._ahead = self._read_raw(self._refill(len(view)))
+            view[:] = memoryview(self._ahead)[:len(view)]
+            self._pos = len(view)
+        else:
+            self._drop_ahead()
+            self._read_raw_into(view)
+
+    @staticmethod
+    def _counter_blocks(block, count):
+        """Returns the big endian counter blocks for count cipher blocks
+        starting at the given block of the stream
+        """
+        mask = (1 << 64) - 1
+        return b''.join([struct.pack('>QQ', (c >> 64) & mask, c & mask)
+                         for c in range(block + 1, block + 1 + count)])
+
+    def _cipher_at(self, offset):
+        """Returns a new CTR keystream positioned at offset.  This pays for
+        key expansion once per call.
+        """
+        if (metrics.enabled):
+            metrics.count('cipher_setups')
+        aes = self.backend.ctr(self.key, offset // self.blocksize, self.ecb)
+        # the keystream carries on mid block, so discard the bytes before
+        # the offset
+        skip = offset % self.blocksize
+        if (skip > 0):
+            aes.keystream(skip)
+        return aes
+
+    def _ecb_at(self, offset, size):
+        """Returns size bytes of the stream starting at offset by encrypting
+        the counter blocks with self.ecb, which reuses the stream's expanded
+        key.  Returns None if the range spans more than ecbblocks cipher
+        blocks; longer ranges are cheaper with _cipher_at(), where key
+        expansion is small next to the keystream work.
+        """
+        block = offset // self.blocksize
+        skip = offset % self.blocksize
+        count = (skip + size + self.blocksize - 1) // self.blocksize
+        if (count > self.ecbblocks):
+            return None
+        blocks = self._counter_blocks(block, count)
+        if (metrics.enabled):
+            keystream = metrics.call('cipher', size, self.ecb.encrypt, blocks)
+        else:
+            keystream = self.ecb.encrypt(blocks)
+        return keystream[skip:skip + size]
+
+    def _generate(self, offset, size):
+        """Returns size bytes of the stream starting at offset, bypassing the
+        cache and leaving the stream position alone
+        """
+        ret = self._ecb_at(offset, size)
+        if (ret is None):
+            aes = self._cipher_at(offset)
+            if (metrics.enabled):
+                ret = metrics.call('cipher', size, aes.keystream, size)
+            else:
+                ret = aes.keystream(size)
         return ret
 
+    def _cached(self, offset, size, cache=None):
+        """Yields views that together cover size bytes of the stream from
+        offset, taken from cached blocks and generating missing ones
+
+        :param cache: the KeystreamCache to use, defaults to the stream's own
+        """
+        if (cache is None):
+            cache = self.cache
+        blocksz = cache.blocksz
+        end = offset + size
+        while (offset < end):
+            index = offset // blocksz
+            block = cache.get(self.key, index)
+            if (metrics.enabled):
+                metrics.count('cache_misses' if block is None else
+                              'cache_hits')
+            if (block is None):
+                block = self._generate(index * blocksz, blocksz)
+                cache.put(self.key, index, block)
+            start = offset - index * blocksz
+            n = min(end - offset, blocksz - start)
+            yield memoryview(block)[start:start + n]
+            offset += n
+
+    def _keystream_at(self, offset, view):
+        """Writes len(view) bytes of the stream starting at offset into view.
+        Does not touch the stream position or cipher.
+        """
+        keystream = self._ecb_at(offset, len(view))
+        if (keystream is not None):
+            view[:] = keystream
+        else:
+            self._read_raw_into(view, self._cipher_at(offset))
+
+    @metrics.timed('seek')
     def seek(self, offset, whence=os.SEEK_SET):
-        """Seeks to the offset specified.  Offsets must be specified absolutely
-        from the beginning of the stream
+        """Seeks to the offset specified.  Like other io streams, offset is
+        relative to the beginning of the stream for SEEK_SET, the current
+        position for SEEK_CUR and the end of the stream for SEEK_END, so
+        seeking from the end takes a negative offset.  As with files,
+        seeking past the end is allowed and reads from there return b''.
+
+        :returns: the new absolute offset
         """
+        self._checkClosed()
         if (whence == os.SEEK_CUR):
             offset += self.offset
         elif (whence == os.SEEK_END):
             if (self.size is None):
                 raise RuntimeError('Cannot seek from end of stream if size'
                                    ' is unknown.')
-            offset = self.size - offset
-
-        # needs to reposition the counter so that we read the same bytes
-        # counter increments on each block
-        # calculate which block we are on
-        self._clear_buffer()
+            offset += self.size
+        elif (whence != os.SEEK_SET):
+            raise ValueError('Invalid whence {0}.'.format(whence))
 
-        counts = offset // self.ctrblocksize
-        # set the counter
-        self.ctr = Counter.new(self.blocksize * 8,
-                               initial_value=counts + 1)
-        self.aes = AES.new(self.key, AES.MODE_CTR, counter=self.ctr)
+        if (offset < 0):
+            raise ValueError('Negative seek position {0}.'.format(offset))
 
-        rem = offset % self.ctrblocksize
-        if (rem > 0):
-            self._fill_buffer()
-            self._seek_buffer(rem)
+        # needs to reposition the counter so that we read the same bytes
+        # counter increments once per cipher block, starting at 1.  offsets
+        # inside the read-ahead buffer only move within it.  with a cache,
+        # reads are served by block and the cipher is not needed
+        if (self.cache is None):
+            start = self.offset - self._pos
+            if (start <= offset <= start + len(self._ahead)):
+                self._pos = offset - start
+            else:
+                self.aes = self._cipher_at(offset)
+                self._drop_ahead()
+        else:
+            self._drop_ahead()
 
         self.offset = offset
+        return self.offset
 
     def tell(self):
         """Returns the byte offset in the random stream.
         """
         return self.offset
 
-    def _interpret_size(self, size):
+    def _interpret_size(self, size, offset=None):
+        if (offset is None):
+            offset = self.offset
+        if (size is not None and size < 0):
+            size = None
         if (self.size is not None):
-            if (size is None or self.offset + size > self.size):
-                size = self.size - self.offset
+            if (size is None or offset + size > self.size):
+                size = max(self.size - offset, 0)
         else:
             if (size is None):
                 # we don't know how much to return
@@ -134,60 +352,421 @@ class RandomIO(object):
                                    ' to read is not.')
         return size
 
-    def read(self, size=None):
+    @metrics.timed('readinto')
+    def readinto(self, b):
+        """Reads random bytes directly into a writable buffer such as a
+        bytearray or memoryview, without any intermediate copies.
+
+        :param b: the writable buffer to fill
+        :returns: the number of bytes written into b
+        """
+        self._checkClosed()
+        view = memoryview(b).cast('B')
+        size = self._interpret_size(len(view))
+
+        if (size < 1):
+            return 0
+
+        if (self.cache is None):
+            self._read_ahead_into(view[:size])
+        else:
+            pos = 0
+            for piece in self._cached(self.offset, size):
+                view[pos:pos + len(piece)] = piece
+                pos += len(piece)
+
+        self.offset += size
+        return size
+
+    def read(self, size=None, workers=None):
         """This object returns size random bytes.
 
         :param size: the number of bytes to read.  if none, returns the entire
             stream
+        :param workers: if greater than one and the backend releases the
+            GIL, generate the bytes in chunks on this many threads
         :returns: size random bytes
         """
+        # small reads that the read-ahead buffer holds are sliced straight
+        # from it, skipping the general path.  close() empties the buffer,
+        # so a closed stream always takes the general path
+        pos = self._pos
+        ahead = self._ahead
+        if (size is not None and 0 < size <= len(ahead) - pos and
+                not metrics.enabled and
+                (self.size is None or self.offset + size <= self.size)):
+            self._pos = pos + size
+            self.offset += size
+            return ahead[pos:pos + size]
+        return self._read(size, workers)
+
+    @metrics.timed('read')
+    def _read(self, size, workers):
+        self._checkClosed()
         size = self._interpret_size(size)
 
         if (size < 1):
             return bytes()
 
-        # if we are reading less than 8 bytes, this function will buffer so
-        # that we are always reading from the block cipher in 8 byte increments
-        # we are doing all this buffering so we can seek the random stream
-        # using counter control.  but the counter only incrememts every 8 bytes
-        # unless we read less than 8 bytes.  to make this simpler, we want to
-        # always read 8 bytes from the block cipher encryption
+        if (self._threaded(size, workers)):
+            ret = b''.join(self._read_parallel(self.offset, size, workers))
+            self.seek(self.offset + size)
+        elif (self.cache is None):
+            ret = self._read_ahead(size)
+            self.offset += size
+        else:
+            ret = b''.join(self._cached(self.offset, size))
+            self.offset += size
+        return ret
 
-        # read the rest of the buffer
-        ret = self._read_buffer(size)
-        size -= len(ret)
+    @metrics.timed('readinto_at')
+    def readinto_at(self, offset, b):
+        """Reads random bytes from an absolute offset directly into a
+        writable buffer.  Like pread, this neither uses nor changes the
+        stream position, so it may be called concurrently from several
+        threads.
 
-        # buffer should now be empty
+        Reads of more than ecbblocks cipher blocks build a new CTR cipher,
+        including key expansion, see _ecb_at().
 
-        # read some raw bytes
-        rem = size % self.ctrblocksize
-        raw_size = size - rem
-        if (raw_size > 0):
-            ret += self._read_raw(raw_size)
+        :param offset: the absolute byte offset in the stream
+        :param b: the writable buffer to fill
+        :returns: the number of bytes written into b
+        """
+        if (offset < 0):
+            raise ValueError('Offset must not be negative.')
+        view = memoryview(b).cast('B')
+        size = self._interpret_size(len(view), offset)
+        if (size > 0):
+            self._keystream_at(offset, view[:size])
+        return size
 
-        if (rem > 0):
-            self._fill_buffer()
-            ret += self._read_buffer(rem)
+    @metrics.timed('read_at')
+    def read_at(self, offset, size=None):
+        """Returns size random bytes from an absolute offset.  Like pread,
+        this neither uses nor changes the stream position, so it may be
+        called concurrently from several threads.
 
-        self.offset += len(ret)
-        return ret
+        Reads of more than ecbblocks cipher blocks build a new CTR cipher,
+        including key expansion, see _ecb_at().
+
+        :param offset: the absolute byte offset in the stream
+        :param size: the number of bytes to read.  if none, reads to the end
+            of the stream
+        :returns: size random bytes
+        """
+        if (offset < 0):
+            raise ValueError('Offset must not be negative.')
+        size = self._interpret_size(size, offset)
+
+        if (size < 1):
+            return bytes()
+
+        return self._generate(offset, size)
+
+    def view(self, size=None, pagesz=4096, pages=64):
+        """Returns a read-only, bytes-like view of the stream that generates
+        only the pages that are indexed, see RandomView.
+
+        :param size: the length of the view.  defaults to the stream size
+        :param pagesz: the size of the pages kept for small reads
+        :param pages: the most pages to keep
+        :returns: a RandomView
+        """
+        return RandomView(self, size, pagesz, pages)
+
+    def random_raw(self, n):
+        """Returns the next n 64 bit words of the stream, read as little
+        endian so that they are the same on every platform.
+
+        :param n: the number of words
+        :returns: an array('Q') of n words
+        """
+        return rng.random_raw(self, n)
+
+    def randints(self, n, low, high):
+        """Returns n integers drawn uniformly and without bias from the
+        stream, as for numpy's integers().
+
+        :param n: the number of integers
+        :param low: the lowest value
+        :param high: one above the highest value.  high - low is at most
+            2 ** 64
+        :returns: a list of n integers
+        """
+        return rng.randints(self, n, low, high)
+
+    def random_floats(self, n):
+        """Returns n floats drawn uniformly from [0, 1) with 53 bits each.
+
+        :param n: the number of floats
+        :returns: a list of n floats
+        """
+        return rng.random_floats(self, n)
+
+    def choice(self, seq, k=None):
+        """Returns a random element of seq, or a list of k of them drawn
+        with replacement if k is given
+        """
+        return rng.choice(self, seq, k)
 
-    def dump(self, fp, size=None):
+    def shuffle(self, items):
+        """Shuffles a mutable sequence in place"""
+        rng.shuffle(self, items)
+
+    def numpy_generator(self):
+        """Returns a numpy.random.Generator seeded from the stream, see
+        RandomIO.rng.numpy_generator()
+        """
+        return rng.numpy_generator(self)
+
+    @metrics.timed('digest')
+    def digest(self, algorithm='sha256', offset=0, size=None, chunk=None):
+        """Hashes a range of the stream without holding it in memory.  The
+        keystream is generated into one reused buffer of at most chunk bytes
+        and fed to the hash from there.  Like read_at(), this neither uses
+        nor changes the stream position.
+
+        :param algorithm: a hashlib algorithm name, or a constructor such as
+            hashlib.sha256
+        :param offset: the absolute byte offset to start hashing at
+        :param size: the number of bytes to hash.  if none, hashes to the end
+            of the stream
+        :param chunk: the buffer size.  defaults to self.bufsz
+        :returns: the digest bytes
+        """
+        if (offset < 0):
+            raise ValueError('Offset must not be negative.')
+        size = self._interpret_size(size, offset)
+        hashes = _hashes(algorithm)
+        self._hash_range(hashes, offset, size, chunk)
+        return hashes[0].digest()
+
+    def _hash_range(self, hashes, offset, size, chunk=None):
+        """Updates each of hashes with size bytes of the stream from offset,
+        generated into one reused buffer of at most chunk bytes
+        """
+        if (size < 1 or len(hashes) < 1):
+            return
+        aes = self._cipher_at(offset)
+        buf = memoryview(bytearray(min(size, chunk or self.bufsz)))
+        while (size > 0):
+            view = buf[:size]
+            self._read_raw_into(view, aes)
+            for h in hashes:
+                h.update(view)
+            size -= len(view)
+
+    @staticmethod
+    def stats():
+        """Returns a snapshot of the process-wide metrics, see
+        RandomIO.metrics.  Metrics are only collected after
+        RandomIO.metrics.enable().
+        """
+        return metrics.stats()
+
+    @staticmethod
+    def digest_many(items, algorithm='sha256', workers=None, backend=None):
+        """Hashes the streams for many seeds, spread over a pool of worker
+        processes.  Only the digests travel back from the workers.
+
+        :param items: an iterable of (seed, size) tuples
+        :param algorithm: a hashlib algorithm name
+        :param workers: the number of worker processes.  if none, one per CPU.
+            with one, the streams are hashed in this process
+        :param backend: the keystream backend name
+        :returns: a list of digest bytes in the order of items
+        """
+        tasks = [(seed, size, algorithm, backend) for (seed, size) in items]
+        if (workers is None):
+            workers = os.cpu_count() or 1
+        if (workers < 2 or len(tasks) < 2):
+            return [_digest_worker(task) for task in tasks]
+        pool = _pool('process', workers)
+        return pool.map(_digest_worker, tasks,
+                        chunksize=max(1, len(tasks) // (4 * workers)))
+
+    @staticmethod
+    def batch_read(seeds, size, workers=None, backend=None):
+        """Returns the first size bytes of the stream for each of many seeds,
+        as RandomIO(seed).read(size) would, see batch_read_at().
+        """
+        return RandomIO.batch_read_at(seeds, 0, size, workers, backend)
+
+    @staticmethod
+    def batch_read_at(seeds, offsets, size, workers=None, backend=None):
+        """Returns size bytes of the stream for each of many seeds, as
+        RandomIO(seed).read_at(offset, size) would.  No RandomIO objects are
+        built: each seed costs one key derivation and one ECB encryption of
+        counter blocks that are shared by every row at the same offset.
+        Rows are written into a single buffer.
+
+        :param seeds: a sequence of seeds.  None is not allowed
+        :param offsets: the offset to read each row from, either one integer
+            for all of them or a sequence with one per seed
+        :param size: the number of bytes per row
+        :param workers: if greater than one, generate rows on this many
+            worker processes.  seeds must then be picklable
+        :param backend: the keystream backend name
+        :returns: a memoryview of shape (len(seeds), size) over a bytearray,
+            or a flat empty memoryview if either is zero
+        """
+        seeds = list(seeds)
+        if (isinstance(offsets, int)):
+            offsets = [offsets] * len(seeds)
+        else:
+            offsets = list(offsets)
+            if (len(offsets) != len(seeds)):
+                raise ValueError('Need one offset per seed.')
+        if (size < 0 or any(offset < 0 for offset in offsets)):
+            raise ValueError('Offsets and size must not be negative.')
+        buf = memoryview(bytearray(len(seeds) * size))
+        if (len(buf) < 1):
+            return buf
+        backend = backends.get(backend).name
+        if (workers is None or workers < 2 or len(seeds) < 2):
+            _batch_into(backend, seeds, offsets, size, buf)
+        else:
+            step = max(1, len(seeds) // (4 * workers))
+            tasks = [(backend, seeds[i:i + step], offsets[i:i + step], size)
+                     for i in range(0, len(seeds), step)]
+            pool = _pool('process', workers)
+            pos = 0
+            for rows in pool.imap(_batch_worker, tasks):
+                buf[pos:pos + len(rows)] = rows
+                pos += len(rows)
+        return buf.cast('B', [len(seeds), size])
+
+    def _parallel(self, size, workers):
+        return (workers is not None and workers > 1 and size > self.chunksz)
+
+    def _threaded(self, size, workers):
+        """Whether to generate in parallel on threads.  This only pays off
+        when the backend releases the GIL; returning chunks from worker
+        processes costs more in pickling and pipe traffic than the cipher
+        work it saves, so other backends stay serial.
+        """
+        return (self.backend.releases_gil and self._parallel(size, workers))
+
+    def _read_parallel(self, offset, size, workers):
+        """Generates size bytes of the stream starting at offset on a pool of
+        threads, yielding chunks of at most chunksz bytes in stream order.
+        At most two chunks per worker are in flight at once, so memory stays
+        bounded however large size is.
+        """
+        pool = _pool('thread', workers)
+        pending = deque()
+        end = offset + size
+        for pos in range(offset, end, self.chunksz):
+            pending.append(pool.apply_async(
+                self.read_at, (pos, min(self.chunksz, end - pos))))
+            if (len(pending) >= 2 * workers):
+                yield pending.popleft().get()
+        while (pending):
+            yield pending.popleft().get()
+
+    def _chunks(self, size):
+        """Returns the (file offset, size) chunks that size bytes are split
+        into for parallel generation and resuming
+        """
+        return [(pos, min(self.chunksz, size - pos))
+                for pos in range(0, size, self.chunksz)]
+
+    def _chunk_done(self, f, file_offset, size, sample=64):
+        """Returns whether a chunk of a file being resumed already holds the
+        stream from the current offset.  Chunks are written front to back,
+        so only the first and last sample bytes are compared with the
+        keystream; a chunk that was cut short or never written, including
+        a hole in a sparse file, fails at its end.
+        """
+        n = min(size, sample)
+        for pos in (file_offset, file_offset + size - n):
+            f.seek(pos)
+            if (f.read(n) != self._generate(self.offset + pos, n)):
+                return False
+        return True
+
+    def _pwrite_parallel(self, fd, path, size, workers, chunks=None):
+        """Generates size bytes of the stream from the current offset and
+        writes them to the start of an open file, each worker writing its
+        own chunks with os.pwrite.  Threads share fd when the backend
+        releases the GIL; otherwise worker processes open path themselves,
+        so no data crosses between processes.
+
+        :param chunks: the (file offset, size) chunks to write.  defaults to
+            all of them
+        """
+        start = self.offset
+        if (chunks is None):
+            chunks = self._chunks(size)
+        if (self.backend.releases_gil):
+            results = _pool('thread', workers).imap_unordered(
+                lambda chunk: _pwrite_chunk(self, fd, start + chunk[0],
+                                            chunk[0], chunk[1]),
+                chunks)
+        else:
+            results = _pool('process', workers).imap_unordered(
+                _pwrite_worker,
+                [(self.backend.name, self.key, path, start + pos, pos, n)
+                 for (pos, n) in chunks])
+        for n in results:
+            pass
+        self.seek(start + size)
+
+    def readall(self):
+        """Reads the remainder of the stream.  The stream size must be known.
+        """
+        return self.read()
+
+    @metrics.timed('dump')
+    def dump(self, fp, size=None, workers=None, bufsz=None, hash=None):
         """This object dump size random bytes into a file specified with path.
 
+        One buffer of at most bufsz bytes is allocated and refilled for every
+        write, so memory use does not depend on size.  fp.write() must not
+        keep a reference to the buffer it is given.
+
         :param fp: a .write() supporting file like object to dump size bytes
         :param size: number of bytes to dump.  if none, dumps the entire stream
+        :param workers: if greater than one and the backend releases the
+            GIL, generate the bytes in chunks on this many threads.  chunks
+            are still written in order
+        :param bufsz: the number of bytes per write.  defaults to self.bufsz
+        :param hash: a hashlib algorithm name, constructor or hash object, or
+            a list of them, to update with every chunk as it is written
+        :returns: if hash is given, the digest, or a list of digests if hash
+            is a list
         """
         size = self._interpret_size(size)
+        hashes = _hashes(hash)
 
-        bufsz = self.bufsz
+        if (self._threaded(size, workers)):
+            for chunk in self._read_parallel(self.offset, size, workers):
+                fp.write(chunk)
+                for h in hashes:
+                    h.update(chunk)
+            self.seek(self.offset + size)
+            return _digests(hash, hashes)
+
+        if (size > 0):
+            buf = memoryview(bytearray(min(size, bufsz or self.bufsz)))
         while (size > 0):
-            if (size < bufsz):
-                bufsz = size
-            fp.write(self.read(bufsz))
-            size -= bufsz
+            n = self.readinto(buf[:size])
+            if (n < 1):
+                break
+            if (metrics.enabled):
+                metrics.count('refills')
+                metrics.call('write', n, fp.write, buf[:n])
+            else:
+                fp.write(buf[:n])
+            for h in hashes:
+                h.update(buf[:n])
+            size -= n
+        return _digests(hash, hashes)
 
-    def genfile(self, size=None, path=''):
+    @metrics.timed('genfile')
+    def genfile(self, size=None, path='', workers=None, bufsz=None,
+                preallocate=False, resume=False, hash=None):
         """This object generates a file of length size bytes in the location
         path
 
@@ -202,12 +781,272 @@ class RandomIO(object):
         :param size: the number of bytes to dump. if none, dumps the entire
             stream
         :param path: the file path, or directory
-        :returns: the file path
+        :param workers: if greater than one, generate the file on this many
+            workers, which write their chunks in place with os.pwrite
+        :param bufsz: the number of bytes per write.  defaults to self.bufsz
+        :param preallocate: reserve the whole file with posix_fallocate
+            before writing, so that large files are not fragmented.  ignored
+            where the platform or file system does not support it
+        :param resume: if the file at path exists, keep the chunks of it that
+            already hold the stream and only generate the rest.  the stream
+            must be at the offset the file was first generated from.  a
+            sequential run restarts at the first chunk that is missing or
+            wrong; a parallel run fills in every such chunk
+        :param hash: hashes to update with the file contents as they are
+            written, as for dump().  chunks must then be written in order,
+            so workers only help when the backend releases the GIL.  with
+            resume, the kept part of the file is hashed from the keystream
+            rather than read back
+        :returns: the file path, or a tuple of the path and what dump()
+            returns if hash is given
         """
         if (os.path.isdir(path) or len(path) == 0):
             path = os.path.join(path, hexlify(os.urandom(16)).decode('utf-8'))
 
-        with open(path, 'wb') as f:
-            self.dump(f, size)
+        size = self._interpret_size(size)
+        resume = (resume and os.path.isfile(path))
+
+        with open(path, 'r+b' if resume else 'wb') as f:
+            chunks = self._chunks(size)
+            if (resume):
+                chunks = [(pos, n) for (pos, n) in chunks
+                          if not self._chunk_done(f, pos, n)]
+            if (preallocate):
+                _fallocate(f.fileno(), size)
+            if (self._parallel(size, workers) and hasattr(os, 'pwrite') and
+                    hash is None):
+                f.truncate(size)
+                self._pwrite_parallel(f.fileno(), path, size, workers,
+                                      chunks)
+            else:
+                done = chunks[0][0] if (len(chunks) > 0) else size
+                hashes = _hashes(hash)
+                if (done > 0):
+                    self._hash_range(hashes, self.offset, done, bufsz)
+                    f.seek(done)
+                    self.seek(self.offset + done)
+                self.dump(f, size - done, workers, bufsz, hashes)
+                if (resume):
+                    f.truncate(size)
 
+        if (hash is not None):
+            return (path, _digests(hash, hashes))
         return path
+
+
+def _fallocate(fd, size):
+    """Reserves size bytes for fd where posix_fallocate is supported"""
+    if (size < 1 or not hasattr(os, 'posix_fallocate')):
+        return
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except OSError:
+        # e.g. EOPNOTSUPP on file systems without fallocate support
+        pass
+
+
+_pools = {}
+
+
+def _pool(kind, workers):
+    """Returns a pool of workers, kept alive for later calls with the same
+    kind and number of workers.  Pools are not shared with forked children.
+    multiprocessing is imported here, as most callers never need it.
+
+    :param kind: 'process' or 'thread'
+    :param workers: the number of workers
+    """
+    key = (kind, workers, os.getpid())
+    pool = _pools.get(key)
+    if (pool is None):
+        if (kind == 'thread'):
+            from multiprocessing.pool import ThreadPool as cls
+        else:
+            from multiprocessing import Pool as cls
+        pool = _pools[key] = cls(workers)
+    return pool
+
+
+@atexit.register
+def _close_pools():
+    for (key, pool) in list(_pools.items()):
+        if (key[2] == os.getpid()):
+            pool.terminate()
+    _pools.clear()
+
+
+_local = threading.local()
+
+
+def _pwrite_chunk(stream, fd, offset, file_offset, size):
+    """Generates size bytes of stream at offset into a buffer kept per
+    thread, since touching fresh memory for every chunk costs more than the
+    cipher, and writes them all to fd at file_offset.
+    """
+    buf = getattr(_local, 'buf', None)
+    if (buf is None or len(buf) < size):
+        buf = _local.buf = bytearray(size)
+    view = memoryview(buf)[:size]
+    stream.readinto_at(offset, view)
+    while (len(view) > 0):
+        n = os.pwrite(fd, view, file_offset)
+        view = view[n:]
+        file_offset += n
+    return size
+
+
+def _hashes(hash):
+    """Returns a list of hash objects for a hashlib algorithm name,
+    constructor or hash object, or a list of them
+    """
+    if (hash is None):
+        return []
+    if (not isinstance(hash, (list, tuple))):
+        hash = [hash]
+    ret = []
+    for h in hash:
+        if (isinstance(h, str)):
+            h = hashlib.new(h)
+        elif (callable(h)):
+            h = h()
+        ret.append(h)
+    return ret
+
+
+def _digests(hash, hashes):
+    """Returns what dump() returns for the hash argument it was given"""
+    if (hash is None):
+        return None
+    if (isinstance(hash, (list, tuple))):
+        return [h.digest() for h in hashes]
+    return hashes[0].digest()
+
+
+def _digest_worker(args):
+    """Hashes the stream for one seed, see RandomIO.digest_many()"""
+    (seed, size, algorithm, backend) = args
+    return RandomIO(seed, size, backend).digest(algorithm)
+
+
+def _derive_key(seed):
+    """Returns the cipher key for a seed"""
+    # strings and integers are hashed as their text without first failing
+    # in hashlib, since raising the TypeError costs more than the hash
+    if (isinstance(seed, (str, int))):
+        return hashlib.sha256(str(seed).encode()).digest()
+    try:
+        return hashlib.sha256(seed).digest()
+    except TypeError:
+        return hashlib.sha256(str(seed).encode()).digest()
+
+
+# the most seeds and key schedules to remember for new streams
+KEY_CACHE_SIZE = 1024
+
+_keys = OrderedDict()
+_schedules = OrderedDict()
+_keys_lock = threading.Lock()
+
+
+def _memo(cache, item, make):
+    """Returns cache[item], calling make() to fill it in on a miss and
+    evicting the least recently used entries past KEY_CACHE_SIZE
+    """
+    with _keys_lock:
+        value = cache.get(item)
+        if (value is not None):
+            cache.move_to_end(item)
+            return value
+    value = make()
+    with _keys_lock:
+        cache[item] = value
+        while (len(cache) > KEY_CACHE_SIZE):
+            cache.popitem(last=False)
+    return value
+
+
+# seed types whose equal values always hash the same bytes.  others, such
+# as 0.0 and -0.0 or Decimal('1.0') and Decimal('1.00'), compare equal
+# but print differently
+_CACHED_SEEDS = (str, bytes, int)
+
+
+def _seed_key(seed):
+    """Returns the cipher key for a seed, remembering recent str, bytes and
+    int seeds.  Seeds are told apart by type as well, since '1' and 1 are
+    different cache entries.
+    """
+    if (type(seed) not in _CACHED_SEEDS):
+        return _derive_key(seed)
+    return _memo(_keys, (type(seed), seed), lambda: _derive_key(seed))
+
+
+def _key_schedule(backend, key):
+    """Returns the shared ECB object, holding the expanded key, for a key"""
+    return _memo(_schedules, (backend.name, key), lambda: backend.ecb(key))
+
+
+def _batch_into(backend, seeds, offsets, size, view):
+    """Writes size bytes of the stream for each seed at its offset into
+    consecutive rows of view, see RandomIO.batch_read_at()
+    """
+    backend = backends.get(backend)
+    # counter blocks depend only on the offset, so rows at the same offset
+    # share them.  block size and ECB limit are the RandomIO defaults
+    counters = {}
+    pos = 0
+    for (seed, offset) in zip(seeds, offsets):
+        key = _derive_key(seed)
+        row = view[pos:pos + size]
+        block = offset // 16
+        skip = offset % 16
+        count = (skip + size + 15) // 16
+        if (count <= 32):
+            blocks = counters.get((block, count))
+            if (blocks is None):
+                blocks = counters[(block, count)] = RandomIO._counter_blocks(
+                    block, count)
+            row[:] = memoryview(
+                backend.ecb(key).encrypt(blocks))[skip:skip + size]
+        else:
+            aes = backend.ctr(key, block)
+            if (skip > 0):
+                aes.keystream(skip)
+            aes.keystream_into(row)
+        pos += size
+
+
+def _batch_worker(args):
+    """Generates rows for a slice of seeds inside a worker process"""
+    (backend, seeds, offsets, size) = args
+    buf = bytearray(len(seeds) * size)
+    _batch_into(backend, seeds, offsets, size, memoryview(buf))
+    return buf
+
+
+_worker_streams = {}
+
+
+def _worker_stream(backend, key):
+    """Returns a stream for a derived key inside a worker process.  The
+    last stream is kept, so later tasks for the same key reuse its ciphers.
+    """
+    stream = _worker_streams.get((backend, key))
+    if (stream is None):
+        stream = RandomIO.from_key(key, backend=backend)
+        _worker_streams.clear()
+        _worker_streams[(backend, key)] = stream
+    return stream
+
+
+def _pwrite_worker(args):
+    """Generates a chunk of the stream for a derived key inside a worker
+    process and writes it into the file at path.
+    """
+    (backend, key, path, offset, file_offset, size) = args
+    stream = _worker_stream(backend, key)
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        return _pwrite_chunk(stream, fd, offset, file_offset, size)
+    finally:
+        os.close(fd)
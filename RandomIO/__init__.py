@@ -22,4 +22,50 @@
 # SOFTWARE.
 
 from .version import __version__  # NOQA
+from . import backends            # NOQA
+from . import metrics             # NOQA
+from . import rng                 # NOQA
+from .cache import KeystreamCache  # NOQA
 from .RandomIO import RandomIO    # NOQA
+from .view import RandomView  # NOQA
+from .pool import RandomIOPool  # NOQA
+
+import sys
+import importlib
+
+# names imported on first use, as asyncio, sockets and multiprocessing
+# would otherwise be most of the cost of importing RandomIO.  each maps to
+# its module, or to None for the modules themselves
+_lazy = {
+    'aio': None,
+    'daemon': None,
+    'merkle': None,
+    'pairstore': None,
+    'resp': None,
+    'AsyncRandomIO': 'aio',
+    'MerkleTree': 'merkle',
+    'MerkleProof': 'merkle',
+    'PairStore': 'pairstore',
+    'PairStoreWriter': 'pairstore',
+    'RedisWriter': 'resp',
+}
+
+
+def __getattr__(name):
+    if (name not in _lazy):
+        raise AttributeError(
+            "module 'RandomIO' has no attribute '{0}'".format(name))
+    module = importlib.import_module('.' + (_lazy[name] or name), __name__)
+    value = module if _lazy[name] is None else getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
+
+
+# module __getattr__ needs Python 3.7, so earlier versions import it all now
+if (sys.version_info < (3, 7)):
+    for _name in _lazy:
+        __getattr__(_name)
@@ -0,0 +1,123 @@
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 William T. James for Storj Labs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import asyncio
+
+from .RandomIO import RandomIO
+
+
+class AsyncRandomIO(object):
+    """Wraps a RandomIO stream for use from asyncio code.  Keystream is
+    generated in an executor, at most chunk bytes per call, so the event
+    loop is never blocked for long.  Reads, seeks and dumps are serialised,
+    so the stream position behaves exactly as it does for RandomIO.
+    """
+
+    def __init__(self, seed=None, size=None, backend=None, executor=None,
+                 chunk=1048576):
+        """Initialization method
+
+        :param seed: an object to use as the seed, as for RandomIO
+        :param size: the maximum size of the stream
+        :param backend: the keystream backend, as for RandomIO
+        :param executor: the executor to generate keystream on.  if none,
+            the event loop's default executor is used
+        :param chunk: the most bytes to generate per executor call
+        """
+        self.stream = RandomIO(seed, size, backend)
+        self.executor = executor
+        self.chunk = chunk
+        self._lock = None
+
+    def _get_lock(self):
+        # created lazily so that the lock belongs to the running loop
+        if (self._lock is None):
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def _chunks(self, size, chunk):
+        """Yields chunks of the stream from the current position.  The
+        caller must hold the lock.
+        """
+        size = self.stream._interpret_size(size)
+        while (size > 0):
+            data = await self._run(self.stream.read, min(size, chunk))
+            if (len(data) < 1):
+                break
+            size -= len(data)
+            yield data
+
+    async def read(self, size=None):
+        """Returns size random bytes.
+
+        :param size: the number of bytes to read.  if none, returns the entire
+            stream
+        :returns: size random bytes
+        """
+        async with self._get_lock():
+            return b''.join([data async for data in
+                             self._chunks(size, self.chunk)])
+
+    async def seek(self, offset, whence=os.SEEK_SET):
+        """Seeks to the offset specified, as for RandomIO.seek()
+
+        :returns: the new absolute offset
+        """
+        async with self._get_lock():
+            return self.stream.seek(offset, whence)
+
+    def tell(self):
+        """Returns the byte offset in the random stream.
+        """
+        return self.stream.tell()
+
+    async def iter_chunks(self, n, size=None):
+        """Yields the stream in chunks of n bytes from the current position,
+        the last of which may be shorter.
+
+        :param n: the size of each chunk
+        :param size: the number of bytes to yield in total.  if none, yields
+            the rest of the stream
+        """
+        async with self._get_lock():
+            async for data in self._chunks(size, n):
+                yield data
+
+    async def dump_async(self, writer, size=None):
+        """Writes size random bytes to an asyncio.StreamWriter, or anything
+        with write() and a drain() coroutine.  Waits for the writer to drain
+        after each chunk, so a slow peer slows generation down instead of
+        filling memory.
+
+        :param writer: the writer to send the bytes to
+        :param size: number of bytes to dump.  if none, dumps the entire stream
+        """
+        async with self._get_lock():
+            async for data in self._chunks(size, self.chunk):
+                writer.write(data)
+                await writer.drain()
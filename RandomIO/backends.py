@@ -0,0 +1,444 @@
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 William T. James for Storj Labs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import struct
+import threading
+
+# shared plaintext for generating keystream, which is the encryption of zeros
+ZEROS = b'\0' * 65536
+
+
+def zeros(size):
+    """Returns size zero bytes of plaintext.  Small sizes are views on ZEROS,
+    larger ones are allocated with calloc, whose pages are not touched until
+    written to, so only the ciphertext costs real memory.
+    """
+    if (size <= len(ZEROS)):
+        return memoryview(ZEROS)[:size]
+    return bytes(size)
+
+
+class Keystream(object):
+    """Base class for AES-CTR keystreams.  Subclasses implement
+    keystream(), and may override keystream_into() when the library can
+    encrypt directly into a writable buffer.
+    """
+
+    def keystream(self, size):
+        """Returns the next size bytes of keystream"""
+        raise NotImplementedError
+
+    def keystream_into(self, view):
+        """Writes the next len(view) bytes of keystream into view"""
+        pos = 0
+        end = len(view)
+        while (pos < end):
+            n = min(end - pos, len(ZEROS))
+            view[pos:pos + n] = self.keystream(n)
+            pos += n
+
+
+class Backend(object):
+    """Base class for keystream backends.  Backends create ciphers from a
+    256 bit key.  The counter for cipher block n of a stream is n + 1 as a
+    128 bit big endian integer, which is what PyCrypto's Counter.new(128)
+    produces, so every backend yields the same bytes.
+    """
+    name = None
+    # whether cipher calls release the GIL, so threads can run them in
+    # parallel
+    releases_gil = False
+
+    def ctr(self, key, block, ecb=None):
+        """Returns a Keystream starting at the given cipher block.  ecb may
+        be an object from ecb() for the same key, whose expanded key is
+        reused where the library allows it.
+        """
+        raise NotImplementedError
+
+    def ecb(self, key):
+        """Returns an object with an encrypt() method for whole blocks.  It
+        must hold no chaining state so it can be shared between threads.
+        """
+        raise NotImplementedError
+
+
+class _CryptographyKeystream(Keystream):
+
+    def __init__(self, encryptor):
+        self.encryptor = encryptor
+        # update_into() first appeared in cryptography 1.8
+        self.into = hasattr(encryptor, 'update_into')
+
+    def keystream(self, size):
+        return self.encryptor.update(zeros(size))
+
+    def keystream_into(self, view):
+        if (not self.into):
+            return Keystream.keystream_into(self, view)
+        zeros = memoryview(ZEROS)
+        pos = 0
+        end = len(view)
+        while (pos < end):
+            n = min(end - pos, len(ZEROS))
+            try:
+                self.encryptor.update_into(zeros[:n], view[pos:pos + n])
+            except ValueError:
+                # older releases want block_size - 1 bytes of slack in the
+                # output buffer
+                self.into = False
+                return Keystream.keystream_into(self, view[pos:])
+            pos += n
+
+
+class _CryptographyECB(object):
+    """Keeps one ECB context open for the life of the stream.  ECB carries
+    nothing between blocks, so whole blocks can be fed to the same context
+    forever.  The context object itself is not safe for concurrent use, so
+    calls are serialised with a lock.
+    """
+
+    def __init__(self, cipher):
+        self.encryptor = cipher.encryptor()
+        self.lock = threading.Lock()
+
+    def encrypt(self, data):
+        with self.lock:
+            return self.encryptor.update(data)
+
+
+class CryptographyBackend(Backend):
+    """AES-CTR from the cryptography package, backed by OpenSSL and AES-NI
+    """
+    name = 'cryptography'
+
+    def __init__(self):
+        from cryptography.hazmat.primitives.ciphers import (Cipher,
+                                                            algorithms,
+                                                            modes)
+        self.Cipher = Cipher
+        self.algorithms = algorithms
+        self.modes = modes
+
+    def ctr(self, key, block, ecb=None):
+        counter = _counter_block(block + 1)
+        cipher = self.Cipher(self.algorithms.AES(key),
+                             self.modes.CTR(counter))
+        return _CryptographyKeystream(cipher.encryptor())
+
+    def ecb(self, key):
+        return _CryptographyECB(self.Cipher(self.algorithms.AES(key),
+                                            self.modes.ECB()))
+
+
+class _PyCryptodomeKeystream(Keystream):
+
+    def __init__(self, cipher):
+        self.cipher = cipher
+
+    def keystream(self, size):
+        return self.cipher.encrypt(zeros(size))
+
+    def keystream_into(self, view):
+        zeros = memoryview(ZEROS)
+        pos = 0
+        end = len(view)
+        while (pos < end):
+            n = min(end - pos, len(ZEROS))
+            self.cipher.encrypt(zeros[:n], output=view[pos:pos + n])
+            pos += n
+
+
+class PyCryptodomeBackend(Backend):
+    """Native AES-CTR from PyCryptodome.  Its C code is called through
+    ctypes or cffi, which release the GIL.
+    """
+    name = 'pycryptodome'
+    releases_gil = True
+
+    def __init__(self):
+        import Crypto
+        from Crypto.Cipher import AES
+        if (Crypto.version_info[0] < 3):
+            raise ImportError('PyCryptodome is not installed.')
+        self.AES = AES
+
+    def ctr(self, key, block, ecb=None):
+        return _PyCryptodomeKeystream(
+            self.AES.new(key, self.AES.MODE_CTR, nonce=b'',
+                         initial_value=block + 1))
+
+    def ecb(self, key):
+        return self.AES.new(key, self.AES.MODE_ECB)
+
+
+class _PyCryptoKeystream(Keystream):
+
+    def __init__(self, cipher):
+        self.cipher = cipher
+
+    def keystream(self, size):
+        return self.cipher.encrypt(bytes(size))
+
+
+class PyCryptoBackend(Backend):
+    """AES-CTR from legacy PyCrypto with a Counter object
+    """
+    name = 'pycrypto'
+
+    def __init__(self):
+        import Crypto
+        from Crypto.Cipher import AES
+        from Crypto.Util import Counter
+        if (Crypto.version_info[0] >= 3):
+            raise ImportError('PyCrypto is not installed.')
+        self.AES = AES
+        self.Counter = Counter
+
+    def ctr(self, key, block, ecb=None):
+        counter = self.Counter.new(128, initial_value=block + 1)
+        return _PyCryptoKeystream(
+            self.AES.new(key, self.AES.MODE_CTR, counter=counter))
+
+    def ecb(self, key):
+        return self.AES.new(key, self.AES.MODE_ECB)
+
+
+def _counter_block(value):
+    """Returns a 128 bit big endian counter block"""
+    mask = (1 << 64) - 1
+    return struct.pack('>QQ', (value >> 64) & mask, value & mask)
+
+
+def _rotl8(x, shift):
+    return ((x << shift) | (x >> (8 - shift))) & 0xff
+
+
+def _xtime(x):
+    x <<= 1
+    return (x ^ 0x11b) if (x & 0x100) else x
+
+
+def _tables():
+    """Builds the AES S-box and the four encryption T-tables"""
+    sbox = [0] * 256
+    p = q = 1
+    while True:
+        # multiply p by 3 and divide q by 3, so that q is the inverse of p
+        p = p ^ _xtime(p)
+        q ^= q << 1
+        q ^= q << 2
+        q ^= q << 4
+        q &= 0xff
+        if (q & 0x80):
+            q ^= 0x09
+        sbox[p] = (q ^ _rotl8(q, 1) ^ _rotl8(q, 2) ^ _rotl8(q, 3) ^
+                   _rotl8(q, 4) ^ 0x63)
+        if (p == 1):
+            break
+    sbox[0] = 0x63
+
+    t0 = []
+    for s in sbox:
+        s2 = _xtime(s)
+        t0.append((s2 << 24) | (s << 16) | (s << 8) | (s2 ^ s))
+    t1 = [((t >> 8) | (t << 24)) & 0xffffffff for t in t0]
+    t2 = [((t >> 16) | (t << 16)) & 0xffffffff for t in t0]
+    t3 = [((t >> 24) | (t << 8)) & 0xffffffff for t in t0]
+    return (sbox, t0, t1, t2, t3)
+
+
+# built by the first _PureAES, so importing RandomIO does not pay for them
+_SBOX = _T0 = _T1 = _T2 = _T3 = None
+
+
+class _PureAES(object):
+    """Pure Python AES block encryption.  Slow, but needs no libraries.
+    """
+
+    def __init__(self, key):
+        global _SBOX, _T0, _T1, _T2, _T3
+        if (_SBOX is None):
+            (_SBOX, _T0, _T1, _T2, _T3) = _tables()
+        self.rounds = len(key) // 4 + 6
+        self.rk = self._expand(key)
+
+    def _expand(self, key):
+        nk = len(key) // 4
+        words = list(struct.unpack('>%dI' % nk, key))
+        rcon = 1
+        for i in range(nk, 4 * (self.rounds + 1)):
+            t = words[i - 1]
+            if (i % nk == 0):
+                t = ((_SBOX[(t >> 16) & 0xff] << 24) |
+                     (_SBOX[(t >> 8) & 0xff] << 16) |
+                     (_SBOX[t & 0xff] << 8) |
+                     _SBOX[t >> 24]) ^ (rcon << 24)
+                rcon = _xtime(rcon)
+            elif (nk > 6 and i % nk == 4):
+                t = ((_SBOX[t >> 24] << 24) |
+                     (_SBOX[(t >> 16) & 0xff] << 16) |
+                     (_SBOX[(t >> 8) & 0xff] << 8) |
+                     _SBOX[t & 0xff])
+            words.append(words[i - nk] ^ t)
+        return words
+
+    def encrypt_block(self, s0, s1, s2, s3):
+        """Encrypts one block given as four 32 bit words"""
+        rk = self.rk
+        t0, t1, t2, t3 = _T0, _T1, _T2, _T3
+        s0 ^= rk[0]
+        s1 ^= rk[1]
+        s2 ^= rk[2]
+        s3 ^= rk[3]
+        k = 4
+        for r in range(1, self.rounds):
+            (s0, s1, s2, s3) = (
+                t0[s0 >> 24] ^ t1[(s1 >> 16) & 0xff] ^
+                t2[(s2 >> 8) & 0xff] ^ t3[s3 & 0xff] ^ rk[k],
+                t0[s1 >> 24] ^ t1[(s2 >> 16) & 0xff] ^
+                t2[(s3 >> 8) & 0xff] ^ t3[s0 & 0xff] ^ rk[k + 1],
+                t0[s2 >> 24] ^ t1[(s3 >> 16) & 0xff] ^
+                t2[(s0 >> 8) & 0xff] ^ t3[s1 & 0xff] ^ rk[k + 2],
+                t0[s3 >> 24] ^ t1[(s0 >> 16) & 0xff] ^
+                t2[(s1 >> 8) & 0xff] ^ t3[s2 & 0xff] ^ rk[k + 3])
+            k += 4
+        sb = _SBOX
+        return struct.pack(
+            '>4I',
+            ((sb[s0 >> 24] << 24) | (sb[(s1 >> 16) & 0xff] << 16) |
+             (sb[(s2 >> 8) & 0xff] << 8) | sb[s3 & 0xff]) ^ rk[k],
+            ((sb[s1 >> 24] << 24) | (sb[(s2 >> 16) & 0xff] << 16) |
+             (sb[(s3 >> 8) & 0xff] << 8) | sb[s0 & 0xff]) ^ rk[k + 1],
+            ((sb[s2 >> 24] << 24) | (sb[(s3 >> 16) & 0xff] << 16) |
+             (sb[(s0 >> 8) & 0xff] << 8) | sb[s1 & 0xff]) ^ rk[k + 2],
+            ((sb[s3 >> 24] << 24) | (sb[(s0 >> 16) & 0xff] << 16) |
+             (sb[(s1 >> 8) & 0xff] << 8) | sb[s2 & 0xff]) ^ rk[k + 3])
+
+    def encrypt(self, data):
+        """Encrypts whole blocks in ECB mode"""
+        words = struct.unpack('>%dI' % (len(data) // 4), data)
+        return b''.join([self.encrypt_block(*words[i:i + 4])
+                         for i in range(0, len(words), 4)])
+
+
+class _PureKeystream(Keystream):
+
+    def __init__(self, aes, block):
+        self.aes = aes
+        self.counter = block + 1
+        self.leftover = b''
+
+    def keystream(self, size):
+        mask = 0xffffffff
+        need = size - len(self.leftover)
+        blocks = [self.leftover]
+        for i in range((need + 15) // 16):
+            c = self.counter
+            blocks.append(self.aes.encrypt_block(
+                (c >> 96) & mask, (c >> 64) & mask, (c >> 32) & mask,
+                c & mask))
+            self.counter = (c + 1) & ((1 << 128) - 1)
+        ret = b''.join(blocks)
+        self.leftover = ret[size:]
+        return ret[:size]
+
+
+class PurePythonBackend(Backend):
+    """Pure Python AES-CTR, used when no cipher library is installed
+    """
+    name = 'python'
+
+    def ctr(self, key, block, ecb=None):
+        return _PureKeystream(ecb or _PureAES(key), block)
+
+    def ecb(self, key):
+        return _PureAES(key)
+
+
+# backends in order of preference
+BACKENDS = [CryptographyBackend, PyCryptodomeBackend, PyCryptoBackend,
+            PurePythonBackend]
+
+_instances = {}
+_default = None
+
+
+def get(name=None):
+    """Returns a backend instance.
+
+    :param name: the backend name, or a Backend instance.  if none, returns
+        the fastest available backend
+    :returns: a Backend instance
+    """
+    if (isinstance(name, Backend)):
+        return name
+    if (name is None):
+        global _default
+        if (_default is None):
+            _default = _first_available()
+        return _default
+    if (name not in _instances):
+        for cls in BACKENDS:
+            if (cls.name == name):
+                try:
+                    _instances[name] = cls()
+                except ImportError:
+                    raise ValueError('Backend {0} is not available.'.format(
+                        name))
+                break
+        else:
+            raise ValueError('Unknown backend {0}.'.format(name))
+    return _instances[name]
+
+
+def names():
+    """Returns the names of every backend, fastest first, without checking
+    that their libraries can be imported
+    """
+    return [cls.name for cls in BACKENDS]
+
+
+def available():
+    """Returns the names of the backends that can be used here, fastest
+    first
+    """
+    names = []
+    for cls in BACKENDS:
+        try:
+            get(cls.name)
+        except ValueError:
+            continue
+        names.append(cls.name)
+    return names
+
+
+def _first_available():
+    """Returns the fastest backend that can be imported, trying them in
+    order of preference and stopping at the first one that works
+    """
+    for cls in BACKENDS:
+        try:
+            return get(cls.name)
+        except ValueError:
+            continue
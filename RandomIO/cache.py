@@ -0,0 +1,110 @@
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 William T. James for Storj Labs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import threading
+
+from collections import OrderedDict
+
+
+class KeystreamCache(object):
+    """A size-bounded, thread-safe LRU cache of keystream blocks, keyed by
+    the derived stream key and the index of an aligned block.  One cache can
+    be shared by any number of RandomIO objects; streams for the same seed
+    then reuse each other's blocks.
+    """
+
+    def __init__(self, maxbytes=67108864, blocksz=4096):
+        """Initialization method
+
+        :param maxbytes: the most keystream bytes to hold before evicting the
+            least recently used blocks
+        :param blocksz: the size of each cached block.  reads are served from
+            whole blocks, so this is the unit of generation and eviction
+        """
+        self.blocksz = blocksz
+        self.maxblocks = max(1, maxbytes // blocksz)
+        self.blocks = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, index):
+        """Returns the cached block, or None if it is not cached
+
+        :param key: the derived stream key
+        :param index: the block index, the stream offset divided by blocksz
+        """
+        with self.lock:
+            block = self.blocks.get((key, index))
+            if (block is None):
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.blocks.move_to_end((key, index))
+            return block
+
+    def put(self, key, index, block):
+        """Caches a block, evicting the least recently used ones if the cache
+        is full
+        """
+        with self.lock:
+            self.blocks[(key, index)] = block
+            self.blocks.move_to_end((key, index))
+            while (len(self.blocks) > self.maxblocks):
+                self.blocks.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drops every cached block.  The counters are kept.
+        """
+        with self.lock:
+            self.blocks.clear()
+
+    def stats(self):
+        """Returns a snapshot of the cache counters
+
+        :returns: dict of hits, misses, evictions, blocks and bytes
+        """
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'blocks': len(self.blocks),
+                'bytes': len(self.blocks) * self.blocksz,
+            }
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared():
+    """Returns the process-wide cache used by RandomIO(..., cache=True)
+    """
+    global _shared
+    with _shared_lock:
+        if (_shared is None):
+            _shared = KeystreamCache()
+        return _shared
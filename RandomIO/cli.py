@@ -0,0 +1,517 @@
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 Josh Brandoff for Storj Labs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import sys
+import time
+import queue
+import functools
+import random
+import argparse
+import RandomIO
+import binascii
+
+from .jobs import hashpair, genfile
+
+
+def _init_worker(stats):
+    """Sets up a worker process, enabling metrics for --stats"""
+    if (stats):
+        RandomIO.metrics.enable()
+
+
+def _measured(func, args):
+    """Runs func(args) and takes the metrics it collected, so that they
+    can be sent back from worker processes and merged.
+
+    :returns: tuple of the result and a metrics snapshot, or None if
+        metrics are disabled
+    """
+    result = func(args)
+    if (not RandomIO.metrics.enabled):
+        return (result, None)
+    snapshot = RandomIO.metrics.stats()
+    RandomIO.metrics.reset()
+    return (result, snapshot)
+
+
+def _device(path):
+    """Returns the device a path is on, used to group files by disk"""
+    return os.stat(os.path.dirname(os.path.abspath(path)) or '.').st_dev
+
+
+USAGE = '''IOTools.py <command> [<args>]
+
+Currently available commands include:
+   pairgen       Outputs a series of seed-hash pairs for files generated
+                 using the RandomIO library.
+   genfiles      Generates many files on disk and writes a seed-path-hash
+                 index.
+   serve         Runs a warm process that takes pairgen, genfile and digest
+                 jobs over a Unix socket.
+   client        Sends a job to a running serve process.'''
+
+
+def _backend_help(text):
+    """Returns the help for a backend option, listing the backends"""
+    return '{0}, one of: {1}. Defaults to the fastest installed.'.format(
+        text, ', '.join(RandomIO.backends.names()))
+
+
+class IOTools(object):
+
+    def __init__(self):
+        """Initialization of top-level IO Tools menu."""
+        parser = argparse.ArgumentParser(
+            description='A series of command-line tools that make use of '
+                        'the RandomIO library.',
+            usage=USAGE)
+        parser.add_argument('command', help='Command to run.')
+        args = parser.parse_args(sys.argv[1:2])
+        if not hasattr(self, args.command):
+            print('Unrecognized command.')
+            parser.print_help()
+            exit(1)
+        getattr(self, args.command)()
+
+    def _sizeformat(self, num):
+        """Utility method for printing byte sizes with easier-to-read units.
+
+        :param num: integer byte number
+        :returns: human-readable string of byte input converted to KB, MB or GB
+        """
+        for x in ['bytes', 'KB', 'MB', 'GB']:
+            if abs(num) < 1024.0:
+                return "%3.1f%s" % (num, x)
+            num /= 1024.0
+
+    def pairgen(self):
+        parser = argparse.ArgumentParser(
+            description='Output a series of seed-hash pairs for files '
+                        'generated in memory using the RandomIO library.',
+            epilog='This tool can be used to pre-generate seed-hash pairs '
+                   'for the Storj uptick service.')
+        parser.add_argument(
+            'size', type=int,
+            help='The target size of each file generated and hashed (in '
+                 'bytes).')
+        parser.add_argument(
+            '-l', '--length', type=int, action='store', default=12,
+            help='The length of the random seed string to use.')
+        parser.add_argument(
+            '-p', '--pairs', type=int, action='store', default=1,
+            help='The number of seed-hash pairs to generate.')
+        parser.add_argument(
+            '-o', '--output', type=str, action='store', default='pairs.out',
+            help='The name of the file you wish to write pairs to.')
+        parser.add_argument(
+            '-r', '--redis', action='store_true',
+            help='Write to file using Redis protocol.')
+        parser.add_argument(
+            '--host', type=str, action='store', default=None,
+            help='Send pairs straight to the Redis server on this host, or '
+                 'Unix socket path, instead of a file.')
+        parser.add_argument(
+            '--port', type=int, action='store', default=6379,
+            help='The port of the Redis server.')
+        parser.add_argument(
+            '--layout', type=str, action='store',
+            choices=RandomIO.resp.LAYOUTS, default='set',
+            help='How to store pairs in Redis.')
+        parser.add_argument(
+            '--key', type=str, action='store', default='pairs',
+            help='The Redis hash to store pairs in with the hset layout.')
+        parser.add_argument(
+            '--ttl', type=int, action='store', default=None,
+            help='Seconds until pairs expire in Redis.')
+        parser.add_argument(
+            '-s', '--store', action='store_true',
+            help='Write to file as an indexed binary pair store.')
+        parser.add_argument(
+            '-j', '--jobs', type=int, action='store', default=1,
+            help='The number of worker processes to hash pairs with.')
+        parser.add_argument(
+            '-b', '--backend', type=str,
+            action='store', default=None,
+            help=_backend_help('The keystream backend to use'))
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Print RandomIO metrics when done.')
+        parser.add_argument(
+            '-v', '--verbose', action='store_true',
+            help='Increase output verbosity.')
+        args = parser.parse_args(sys.argv[2:])
+
+        try:
+            backend = RandomIO.backends.get(args.backend).name
+        except ValueError as ex:
+            print(ex)
+            exit(1)
+        if (args.verbose):
+            print('Using {0} backend.'.format(backend))
+
+        pairs = args.pairs or 1
+        tasks = ((os.urandom(args.length or 12), args.size, backend)
+                 for i in range(pairs))
+        work = functools.partial(_measured, hashpair)
+        _init_worker(args.stats)
+
+        pool = None
+        if (args.jobs > 1):
+            import multiprocessing
+            pool = multiprocessing.Pool(args.jobs, _init_worker,
+                                        (args.stats,))
+            results = pool.imap(work, tasks)
+        else:
+            results = map(work, tasks)
+
+        try:
+            start = last = time.time()
+            if (args.store):
+                out = RandomIO.PairStoreWriter(args.output or 'pairs.out',
+                                               args.length or 12, pairs)
+            elif (args.host):
+                out = RandomIO.RedisWriter(
+                    RandomIO.resp.connect(args.host, args.port),
+                    args.layout, args.key, args.ttl)
+            elif (args.redis):
+                out = RandomIO.RedisWriter(
+                    open(args.output or 'pairs.out', 'wb'),
+                    args.layout, args.key, args.ttl)
+            else:
+                out = open(args.output or 'pairs.out', 'w')
+            with out as f:
+                for (i, ((hexseed, hash), snapshot)) in enumerate(results, 1):
+                    if (snapshot is not None):
+                        RandomIO.metrics.merge(snapshot)
+                    if (args.store):
+                        f.add(binascii.unhexlify(hexseed),
+                              binascii.unhexlify(hash))
+                    elif (args.host or args.redis):
+                        f.add(hexseed, hash)
+                    else:
+                        f.write('{0} {1}\n'.format(hexseed, hash))
+                    now = time.time()
+                    if (args.verbose and (now - last >= 1 or i == pairs)):
+                        last = now
+                        self._progress(i, pairs, args.size, now - start)
+        finally:
+            if (pool is not None):
+                pool.terminate()
+                pool.join()
+        if (args.stats):
+            print(RandomIO.metrics.summary(RandomIO.metrics.stats()))
+
+    def genfiles(self):
+        parser = argparse.ArgumentParser(
+            description='Generate many files using the RandomIO library, '
+                        'writing an index of the seed, path and sha256 hash '
+                        'of each.',
+            epilog='Files are hashed as they are written, so they are never '
+                   'read back.')
+        parser.add_argument(
+            '-m', '--manifest', type=str, action='store', default=None,
+            help='A file listing the files to generate, one per line as: '
+                 'size path [hexseed].  Files without a seed get a random '
+                 'one.')
+        parser.add_argument(
+            '-n', '--count', type=int, action='store', default=1,
+            help='The number of files to generate when there is no manifest.')
+        parser.add_argument(
+            '-s', '--size', type=int, action='store', default=1048576,
+            help='The size of each file (in bytes), or the smallest size '
+                 'with --max-size.')
+        parser.add_argument(
+            '-x', '--max-size', type=int, action='store', default=None,
+            help='Pick each file size uniformly between --size and this (in '
+                 'bytes).')
+        parser.add_argument(
+            '-d', '--directory', type=str, action='append', default=None,
+            help='A directory to generate files in.  May be given once per '
+                 'disk; files are spread over the directories in turn.')
+        parser.add_argument(
+            '-l', '--length', type=int, action='store', default=12,
+            help='The length of the random seed string to use.')
+        parser.add_argument(
+            '-o', '--output', type=str, action='store', default='index.out',
+            help='The name of the index file to write.')
+        parser.add_argument(
+            '-j', '--jobs', type=int, action='store', default=1,
+            help='The number of worker processes to generate files with.')
+        parser.add_argument(
+            '-c', '--per-disk', type=int, action='store', default=None,
+            help='The most files to generate at once on each disk.')
+        parser.add_argument(
+            '-b', '--backend', type=str,
+            action='store', default=None,
+            help=_backend_help('The keystream backend to use'))
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Print RandomIO metrics when done.')
+        parser.add_argument(
+            '-v', '--verbose', action='store_true',
+            help='Increase output verbosity.')
+        args = parser.parse_args(sys.argv[2:])
+
+        try:
+            backend = RandomIO.backends.get(args.backend).name
+        except ValueError as ex:
+            print(ex)
+            exit(1)
+
+        tasks = []
+        if (args.manifest):
+            with open(args.manifest, 'r') as f:
+                for line in f:
+                    fields = line.split()
+                    if (len(fields) < 2):
+                        continue
+                    if (len(fields) > 2):
+                        seed = binascii.unhexlify(fields[2])
+                    else:
+                        seed = os.urandom(args.length or 12)
+                    tasks.append((seed, int(fields[0]), fields[1], backend))
+        else:
+            directories = args.directory or ['.']
+            for i in range(args.count):
+                seed = os.urandom(args.length or 12)
+                size = args.size
+                if (args.max_size is not None):
+                    size = random.randint(args.size, args.max_size)
+                path = os.path.join(directories[i % len(directories)],
+                                    binascii.hexlify(seed).decode('ascii'))
+                tasks.append((seed, size, path, backend))
+
+        jobs = max(1, args.jobs)
+        limit = args.per_disk or jobs
+        _init_worker(args.stats)
+        results = self._schedule(tasks, jobs, limit, args.stats)
+
+        total = 0
+        start = time.time()
+        with open(args.output or 'index.out', 'w') as f:
+            for (i, (task, ((hexseed, path, hash), snapshot))) in enumerate(
+                    results, 1):
+                if (snapshot is not None):
+                    RandomIO.metrics.merge(snapshot)
+                f.write('{0} {1} {2}\n'.format(hexseed, path, hash))
+                total += task[1]
+                if (args.verbose):
+                    print('{0}/{1} {2}'.format(i, len(tasks), path))
+        elapsed = max(time.time() - start, 1e-9)
+        print('{0} files, {1} in {2:.1f}s, {3}/s'.format(
+            len(tasks), self._sizeformat(total), elapsed,
+            self._sizeformat(total / elapsed)))
+        if (args.stats):
+            print(RandomIO.metrics.summary(RandomIO.metrics.stats()))
+
+    def _schedule(self, tasks, jobs, limit, stats=False):
+        """Runs jobs.genfile() for each task on a pool of worker processes,
+        with at most limit files being generated on any one disk at a time.
+
+        :param tasks: list of jobs.genfile() argument tuples
+        :param jobs: the number of worker processes
+        :param limit: the most concurrent files per disk
+        :param stats: whether workers collect metrics
+        :returns: generator of (task, _measured() result) tuples in
+            completion order
+        """
+        work = functools.partial(_measured, genfile)
+        if (jobs < 2):
+            for task in tasks:
+                yield (task, work(task))
+            return
+
+        pending = {}
+        for task in tasks:
+            pending.setdefault(_device(task[2]), []).append(task)
+        running = dict.fromkeys(pending, 0)
+        done = queue.Queue()
+
+        import multiprocessing
+        pool = multiprocessing.Pool(jobs, _init_worker, (stats,))
+        try:
+            active = 0
+            left = len(tasks)
+            while (left > 0):
+                for (device, waiting) in pending.items():
+                    while (waiting and active < jobs and
+                           running[device] < limit):
+                        task = waiting.pop(0)
+                        pool.apply_async(
+                            work, (task,),
+                            callback=lambda result, task=task, device=device:
+                            done.put((task, device, result)),
+                            error_callback=lambda ex: done.put(ex))
+                        running[device] += 1
+                        active += 1
+                item = done.get()
+                if (isinstance(item, Exception)):
+                    raise item
+                (task, device, result) = item
+                running[device] -= 1
+                active -= 1
+                left -= 1
+                yield (task, result)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def serve(self):
+        parser = argparse.ArgumentParser(
+            description='Serve pairgen, genfile and digest jobs on a Unix '
+                        'socket from one warm process and pool of workers.',
+            epilog='Send jobs with the client command, or see '
+                   'RandomIO/daemon.py for the protocol.')
+        parser.add_argument(
+            '-s', '--socket', type=str, action='store', default=None,
+            help='The socket path to listen on.')
+        parser.add_argument(
+            '-j', '--jobs', type=int, action='store', default=None,
+            help='The number of worker processes. Defaults to one per CPU.')
+        parser.add_argument(
+            '-b', '--backend', type=str, action='store', default=None,
+            help=_backend_help('The default keystream backend'))
+        parser.add_argument(
+            '-v', '--verbose', action='store_true',
+            help='Increase output verbosity.')
+        args = parser.parse_args(sys.argv[2:])
+
+        import signal
+        from . import daemon
+        try:
+            server = daemon.Server(args.socket, args.jobs, args.backend)
+        except (ValueError, OSError) as ex:
+            print(ex)
+            exit(1)
+        # exit through the finally below, removing the socket
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            if (args.verbose):
+                print('Serving on {0} with {1} workers and the {2} '
+                      'backend.'.format(server.path, server.jobs,
+                                        server.backend))
+                sys.stdout.flush()
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+    def client(self):
+        parser = argparse.ArgumentParser(
+            description='Send a job to a running IOTools.py serve process '
+                        'and write out its results as they arrive.',
+            epilog='pairgen writes seed-hash pairs like the pairgen command, '
+                   'genfile a seed-path-hash index line like genfiles, and '
+                   'digest seed-hash pairs.')
+        parser.add_argument(
+            '-s', '--socket', type=str, action='store', default=None,
+            help='The socket path of the server.')
+        parser.add_argument(
+            '-o', '--output', type=str, action='store', default=None,
+            help='The file to write results to. Defaults to standard output.')
+        parser.add_argument(
+            '-b', '--backend', type=str, action='store', default=None,
+            help='The keystream backend to use. Defaults to the server\'s.')
+        ops = parser.add_subparsers(
+            dest='op', metavar='op',
+            help='One of: pairgen, genfile, digest.')
+        ops.required = True
+        pairgen = ops.add_parser('pairgen', help='Generate seed-hash pairs.')
+        pairgen.add_argument(
+            'size', type=int,
+            help='The size of each stream to hash (in bytes).')
+        pairgen.add_argument(
+            '-l', '--length', type=int, action='store', default=12,
+            help='The length of the random seed string to use.')
+        pairgen.add_argument(
+            '-p', '--pairs', type=int, action='store', default=1,
+            help='The number of seed-hash pairs to generate.')
+        genfile = ops.add_parser('genfile', help='Generate a file.')
+        genfile.add_argument(
+            'size', type=int, help='The size of the file (in bytes).')
+        genfile.add_argument(
+            'path', type=str, help='The path of the file to write.')
+        genfile.add_argument(
+            '--seed', type=str, action='store', default=None,
+            help='The hex-encoded seed. Defaults to a random one.')
+        digest = ops.add_parser('digest', help='Hash the streams for seeds.')
+        digest.add_argument(
+            'size', type=int,
+            help='The size of each stream to hash (in bytes).')
+        digest.add_argument(
+            'seeds', type=str, nargs='+', help='The hex-encoded seeds.')
+        digest.add_argument(
+            '-a', '--algorithm', type=str, action='store', default='sha256',
+            help='The hashlib algorithm to use.')
+        args = parser.parse_args(sys.argv[2:])
+
+        from . import daemon
+        job = {'op': args.op, 'backend': args.backend}
+        if (args.op == 'pairgen'):
+            job.update(size=args.size, pairs=args.pairs, length=args.length)
+        elif (args.op == 'genfile'):
+            # the server may have a different working directory
+            job['files'] = [{'size': args.size, 'seed': args.seed,
+                             'path': os.path.abspath(args.path)}]
+        else:
+            job.update(size=args.size, seeds=args.seeds,
+                       algorithm=args.algorithm)
+
+        out = open(args.output, 'w') if args.output else sys.stdout
+        try:
+            for result in daemon.request(job, args.socket):
+                if (args.op == 'genfile'):
+                    out.write('{0} {1} {2}\n'.format(
+                        result['seed'], result['path'], result['hash']))
+                else:
+                    out.write('{0} {1}\n'.format(result['seed'],
+                                                 result['hash']))
+        except (IOError, OSError) as ex:
+            print(ex, file=sys.stderr)
+            exit(1)
+        finally:
+            if (out is not sys.stdout):
+                out.close()
+
+    def _progress(self, done, total, size, elapsed):
+        """Prints pair generation progress and throughput.
+
+        :param done: number of pairs completed
+        :param total: total number of pairs
+        :param size: byte size of each generated file
+        :param elapsed: seconds since generation started
+        """
+        elapsed = max(elapsed, 1e-9)
+        print('{0}/{1} pairs, {2:.1f} pairs/s, {3}/s'.format(
+            done, total, done / elapsed,
+            self._sizeformat(done * size / elapsed)))
+
+
+def main():
+    IOTools()
+
+
+if __name__ == '__main__':
+    main()
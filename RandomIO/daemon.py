@@ -0,0 +1,230 @@
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 William T. James for Storj Labs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""A long-running process that takes IOTools jobs over a Unix socket, so
+that many small jobs share one warm interpreter, cipher backend and pool
+of worker processes instead of each starting their own.
+
+Requests and replies are JSON objects, one per line, and a connection may
+send any number of requests in turn.  The results of a request are
+streamed back one per line as they are done, followed by {"done": true},
+or by {"error": message} if the request failed.  Requests are:
+
+    {"op": "pairgen", "size": 1000000, "pairs": 10, "length": 12}
+        replies {"seed": hexseed, "hash": hexhash} for each pair
+    {"op": "genfile", "files": [{"size": 1000, "path": "/a/b",
+                                 "seed": hexseed}]}
+        replies {"seed": hexseed, "path": path, "hash": hexhash} for each
+        file, generating a seed where none is given
+    {"op": "digest", "size": 1000000, "seeds": [hexseed, ...],
+     "algorithm": "sha256"}
+        replies {"seed": hexseed, "hash": hexhash} for each seed
+
+Each request may also name a "backend".  Results come back in the order
+of the request.
+"""
+
+import os
+import json
+import stat
+import socket
+import binascii
+import tempfile
+import socketserver
+
+from . import backends
+from .jobs import hashpair, genfile, digestpair
+
+
+def _private(path):
+    """Returns whether path is a directory that only the current user owns
+    and can use
+    """
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return (stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and
+            st.st_mode & 0o077 == 0)
+
+
+def default_socket():
+    """Returns the socket path used when none is given, one per user.  It
+    is in $XDG_RUNTIME_DIR, or else in a randomio-<uid> directory in the
+    temporary directory that is created private to the user.  Either way
+    no other user can put a socket there first.
+
+    :raises OSError: if the directory in the temporary directory belongs
+        to another user or others can use it
+    """
+    runtime = os.environ.get('XDG_RUNTIME_DIR')
+    if (runtime and _private(runtime)):
+        return os.path.join(runtime, 'randomio.sock')
+    path = os.path.join(tempfile.gettempdir(),
+                        'randomio-{0}'.format(os.getuid()))
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    if (not _private(path)):
+        raise OSError('{0} is not a directory private to this user.'.format(
+            path))
+    return os.path.join(path, 'randomio.sock')
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                for result in self.server.run(json.loads(line.decode())):
+                    self._reply(result)
+                self._reply({'done': True})
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            except (ValueError, KeyError, TypeError, AttributeError,
+                    OSError) as ex:
+                self._reply({'error': str(ex) or type(ex).__name__})
+
+    def _reply(self, result):
+        self.wfile.write(json.dumps(result).encode() + b'\n')
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves jobs on a Unix socket.  Each connection is handled on its
+    own thread, and the work of every connection runs on one shared pool
+    of worker processes.
+    """
+    daemon_threads = True
+
+    def __init__(self, path=None, jobs=None, backend=None):
+        """Initialization method
+
+        :param path: the socket path.  if none, default_socket()
+        :param jobs: the number of worker processes.  if none, one per CPU.
+            with one, jobs run on the connection's thread
+        :param backend: the default backend name for requests that do not
+            name one.  if none, the fastest available
+        :raises OSError: if another server is listening on path, or path
+            belongs to another user
+        """
+        path = path or default_socket()
+        if (os.path.exists(path)):
+            if (os.lstat(path).st_uid != os.getuid()):
+                raise OSError('{0} belongs to another user.'.format(path))
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except OSError:
+                # left behind by a server that did not shut down cleanly
+                os.remove(path)
+            else:
+                raise OSError('A server is already listening on {0}.'.format(
+                    path))
+            finally:
+                probe.close()
+        # set up the cipher now rather than on the first request
+        self.backend = backends.get(backend).name
+        self.jobs = jobs or os.cpu_count() or 1
+        self.pool = None
+        if (self.jobs > 1):
+            import multiprocessing
+            self.pool = multiprocessing.Pool(self.jobs)
+        socketserver.UnixStreamServer.__init__(self, path, _Handler)
+        self.path = path
+
+    def server_bind(self):
+        # only the owner may connect, as jobs can write files anywhere the
+        # server can.  the server is not listening yet, so nobody can
+        # connect before this
+        socketserver.UnixStreamServer.server_bind(self)
+        os.chmod(self.server_address, 0o600)
+
+    def _map(self, func, tasks):
+        """Returns the results of func for each task, in order, as they
+        are done
+        """
+        if (self.pool is None or len(tasks) < 2):
+            return map(func, tasks)
+        return self.pool.imap(
+            func, tasks, chunksize=max(1, len(tasks) // (4 * self.jobs)))
+
+    def run(self, request):
+        """Runs a request, yielding its results
+
+        :param request: a request dict, see the module documentation
+        :raises ValueError: if the request is not valid
+        """
+        op = request.get('op')
+        backend = backends.get(request.get('backend') or self.backend).name
+        if (op == 'pairgen'):
+            tasks = [(os.urandom(int(request.get('length', 12))),
+                      int(request['size']), backend)
+                     for i in range(int(request.get('pairs', 1)))]
+            for (seed, hash) in self._map(hashpair, tasks):
+                yield {'seed': seed, 'hash': hash}
+        elif (op == 'genfile'):
+            tasks = [(binascii.unhexlify(f['seed']) if f.get('seed')
+                      else os.urandom(12), int(f['size']), f['path'],
+                      backend) for f in request['files']]
+            for (seed, path, hash) in self._map(genfile, tasks):
+                yield {'seed': seed, 'path': path, 'hash': hash}
+        elif (op == 'digest'):
+            algorithm = request.get('algorithm', 'sha256')
+            tasks = [(binascii.unhexlify(seed), int(request['size']),
+                      algorithm, backend) for seed in request['seeds']]
+            for (seed, hash) in self._map(digestpair, tasks):
+                yield {'seed': seed, 'hash': hash}
+        else:
+            raise ValueError('Unknown op {0}.'.format(op))
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if (self.pool is not None):
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        if (os.path.exists(self.path)):
+            os.remove(self.path)
+
+
+def request(job, path=None):
+    """Sends a job to a server and yields its results as they arrive
+
+    :param job: a request dict, see the module documentation
+    :param path: the socket path.  if none, default_socket()
+    :raises IOError: if the server replies with an error
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path or default_socket())
+    with sock, sock.makefile('rb') as replies:
+        sock.sendall(json.dumps(job).encode() + b'\n')
+        for line in replies:
+            result = json.loads(line.decode())
+            if ('error' in result):
+                raise IOError('Server replied: {0}'.format(result['error']))
+            if (result.get('done')):
+                return
+            yield result
+    raise IOError('Server closed the connection.')
@@ -0,0 +1,77 @@
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 William T. James for Storj Labs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""The jobs run by IOTools, both from the command line and by the serve
+daemon.  Each takes one tuple of arguments and returns hex-encoded
+results, so that it can be mapped over a pool of worker processes.
+"""
+
+import binascii
+
+from .RandomIO import RandomIO
+
+# streams are generated and hashed this many bytes at a time, so memory use
+# does not depend on the stream size
+HASH_CHUNK = 1048576
+
+
+def _hex(data):
+    return binascii.hexlify(data).decode('ascii')
+
+
+def hashpair(args):
+    """Hashes the stream generated from a seed with sha256
+
+    :param args: tuple of seed bytes, stream size in bytes and backend name
+    :returns: tuple of hex-encoded seed and hex-encoded sha256 hash
+    """
+    (seed, size, backend) = args
+    return digestpair((seed, size, 'sha256', backend))
+
+
+def digestpair(args):
+    """Hashes the stream generated from a seed with any hashlib algorithm
+
+    :param args: tuple of seed bytes, stream size in bytes, algorithm name
+        and backend name
+    :returns: tuple of hex-encoded seed and hex-encoded digest
+    """
+    (seed, size, algorithm, backend) = args
+    hash = RandomIO(seed, size, backend).digest(algorithm, chunk=HASH_CHUNK)
+    return (_hex(seed), _hex(hash))
+
+
+def genfile(args):
+    """Generates a file from a seed, hashing each chunk as it is written so
+    the file is never read back.
+
+    :param args: tuple of seed bytes, file size in bytes, file path and
+        backend name
+    :returns: tuple of hex-encoded seed, file path and hex-encoded sha256
+        hash
+    """
+    (seed, size, path, backend) = args
+    (path, hash) = RandomIO(seed, size, backend).genfile(
+        size, path, bufsz=HASH_CHUNK, hash='sha256')
+    return (_hex(seed), path, _hex(hash))
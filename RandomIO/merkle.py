@@ -0,0 +1,272 @@
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 William T. James for Storj Labs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import hashlib
+
+from collections import namedtuple
+
+from .RandomIO import _pool, _worker_stream
+
+# a proof covers whole leaves, so offset and size are those of the leaf
+# aligned range holding the bytes that were asked for
+MerkleProof = namedtuple('MerkleProof', ['offset', 'size', 'hashes'])
+
+# leaves and interior nodes are hashed with different prefixes, so that no
+# leaf can pass for an interior node
+LEAF = b'\x00'
+NODE = b'\x01'
+
+
+def _hasher(algorithm):
+    """Returns a constructor for a hashlib algorithm name or constructor"""
+    if (callable(algorithm)):
+        return algorithm
+    return lambda: hashlib.new(algorithm)
+
+
+def _leaf_count(size, leafsz):
+    """Returns the number of leaves over size bytes.  An empty stream has a
+    single empty leaf.
+    """
+    return max(1, (size + leafsz - 1) // leafsz)
+
+
+def _parent(new, left, right):
+    h = new()
+    h.update(NODE)
+    h.update(left)
+    h.update(right)
+    return h.digest()
+
+
+def _levels(nodes, new, height=None):
+    """Hashes a level of nodes up to the level height above it, or to a
+    single root.  A node without a sibling is carried up unchanged.
+
+    :returns: a list of levels, each a list of digests, starting with nodes
+    """
+    levels = [nodes]
+    while (len(nodes) > 1 and (height is None or len(levels) <= height)):
+        up = [_parent(new, nodes[i], nodes[i + 1])
+              for i in range(0, len(nodes) - 1, 2)]
+        if (len(nodes) % 2):
+            up.append(nodes[-1])
+        levels.append(up)
+        nodes = up
+    return levels
+
+
+def _leaves(stream, first, last, leafsz, new, buf=None):
+    """Hashes leaves first to last, exclusive, generating their keystream in
+    one pass from the leaf offsets.
+
+    :returns: a list of leaf digests
+    """
+    offset = first * leafsz
+    size = min(last * leafsz, stream.size) - offset
+    if (buf is None or len(buf) < size):
+        buf = memoryview(bytearray(size))
+    view = buf[:size]
+    if (size > 0):
+        stream._keystream_at(offset, view)
+    ret = []
+    for pos in range(0, max(size, 1), leafsz):
+        h = new()
+        h.update(LEAF)
+        h.update(view[pos:pos + leafsz])
+        ret.append(h.digest())
+    return ret
+
+
+def _subtree_worker(args):
+    """Returns the root of one span of leaves inside a worker process"""
+    (backend, key, size, leafsz, span, algorithm, index) = args
+    stream = _worker_stream(backend, key)
+    stream.size = size
+    return _subtree(stream, index, leafsz, span, _hasher(algorithm))[-1][0]
+
+
+def _subtree(stream, index, leafsz, span, new, buf=None):
+    """Returns the levels of the subtree over the index-th span of leaves"""
+    count = _leaf_count(stream.size, leafsz)
+    first = index * span
+    leaves = _leaves(stream, first, min(first + span, count), leafsz, new,
+                     buf)
+    return _levels(leaves, new)
+
+
+class MerkleTree(object):
+    """A hash tree over fixed-size leaves of a RandomIO stream.  Only the
+    levels from the subtrees of span leaves up to the root are kept.  A
+    proof regenerates the leaves of at most two subtrees, those at the ends
+    of the range it covers, straight from their offsets in the stream, so
+    proofs for a small range cost the same however large the stream is.
+    """
+
+    def __init__(self, stream, leafsz=4096, span=256, algorithm='sha256',
+                 workers=None):
+        """Initialization method.  Builds the tree, generating the whole
+        stream once.
+
+        :param stream: the RandomIO stream to build the tree over.  its size
+            must be known.  the stream position is not used
+        :param leafsz: the number of stream bytes per leaf
+        :param span: the number of leaves below each kept node, a power of
+            two.  larger spans keep fewer hashes in memory, smaller ones
+            make proofs cheaper
+        :param algorithm: a hashlib algorithm name, or a constructor such as
+            hashlib.sha256
+        :param workers: if greater than one, hash the subtrees on this many
+            worker processes.  algorithm must then be a name
+        """
+        if (stream.size is None):
+            raise RuntimeError('Stream size must be specified to build a'
+                               ' Merkle tree.')
+        if (span < 1 or span & (span - 1)):
+            raise ValueError('Span must be a power of two.')
+        self.stream = stream
+        self.size = stream.size
+        self.leafsz = leafsz
+        self.span = span
+        self.algorithm = algorithm
+        self.new = _hasher(algorithm)
+        self.count = _leaf_count(self.size, leafsz)
+        self.height = (self.count - 1).bit_length()
+        # the level of the kept nodes.  levels below it are regenerated
+        self.base = min(span.bit_length() - 1, self.height)
+        span = 1 << self.base
+        tasks = range((self.count + span - 1) // span)
+        if (workers is not None and workers > 1 and len(tasks) > 1):
+            roots = _pool('process', workers).imap(
+                _subtree_worker,
+                [(stream.backend.name, stream.key, self.size, leafsz, span,
+                  algorithm, index) for index in tasks],
+                chunksize=max(1, len(tasks) // (4 * workers)))
+        else:
+            buf = memoryview(bytearray(min(span * leafsz, self.size)))
+            roots = (_subtree(stream, index, leafsz, span, self.new,
+                              buf)[-1][0] for index in tasks)
+        self.levels = _levels(list(roots), self.new)
+
+    @property
+    def root(self):
+        """The root hash"""
+        return self.levels[-1][0]
+
+    def _range(self, offset, size):
+        """Returns the leaves first to last, exclusive, covering size bytes
+        from offset
+        """
+        if (offset < 0 or size < 0 or offset + size > self.size):
+            raise ValueError('Range is outside of the stream.')
+        first = min(offset // self.leafsz, self.count - 1)
+        last = max(first + 1, (offset + size + self.leafsz - 1) //
+                   self.leafsz)
+        return (first, last)
+
+    def prove(self, offset, size=1):
+        """Returns an inclusion proof for a byte range of the stream.
+
+        :param offset: the offset of the first byte to prove
+        :param size: the number of bytes to prove
+        :returns: a MerkleProof for the leaf aligned range holding the bytes
+        """
+        (first, last) = self._range(offset, size)
+        subtrees = {}
+        hashes = []
+
+        def node(level, index):
+            if (level >= self.base):
+                return self.levels[level - self.base][index]
+            shift = self.base - level
+            subtree = subtrees.get(index >> shift)
+            if (subtree is None):
+                subtree = subtrees[index >> shift] = _subtree(
+                    self.stream, index >> shift, self.leafsz,
+                    1 << self.base, self.new)
+            return subtree[level][index - ((index >> shift) << shift)]
+
+        def walk(level, index):
+            start = index << level
+            end = min((index + 1) << level, self.count)
+            if (end <= first or start >= last):
+                hashes.append(node(level, index))
+            elif (start < first or end > last):
+                walk(level - 1, 2 * index)
+                if ((2 * index + 1) << (level - 1) < self.count):
+                    walk(level - 1, 2 * index + 1)
+
+        walk(self.height, 0)
+        offset = first * self.leafsz
+        return MerkleProof(offset, min(last * self.leafsz, self.size) -
+                           offset, hashes)
+
+    def verify(self, data, proof):
+        """Checks data against this tree's root, see verify()"""
+        return verify(self.root, data, proof, self.size, self.leafsz,
+                      self.algorithm)
+
+
+def verify(root, data, proof, size, leafsz=4096, algorithm='sha256'):
+    """Checks that data is the range of a stream described by proof.  Only
+    the root and the shape of the tree are needed, not the stream.
+
+    :param root: the root hash of the tree
+    :param data: the bytes of the range, proof.size of them
+    :param proof: a MerkleProof from MerkleTree.prove()
+    :param size: the size of the stream the tree was built over
+    :param leafsz: the leaf size the tree was built with
+    :param algorithm: the hash algorithm the tree was built with
+    :returns: True if data belongs to the tree at proof.offset
+    """
+    if (len(data) != proof.size or proof.offset % leafsz or
+            proof.offset + proof.size > size):
+        return False
+    new = _hasher(algorithm)
+    count = _leaf_count(size, leafsz)
+    first = proof.offset // leafsz
+    view = memoryview(data)
+    hashes = iter(proof.hashes)
+
+    def walk(level, index):
+        start = index << level
+        end = min((index + 1) << level, count)
+        if (end <= first or start * leafsz >= proof.offset + max(
+                proof.size, 1)):
+            return next(hashes)
+        if (level == 0):
+            h = new()
+            h.update(LEAF)
+            h.update(view[(index - first) * leafsz:
+                          (index - first + 1) * leafsz])
+            return h.digest()
+        left = walk(level - 1, 2 * index)
+        if ((2 * index + 1) << (level - 1) >= count):
+            return left
+        return _parent(new, left, walk(level - 1, 2 * index + 1))
+
+    try:
+        ret = walk((count - 1).bit_length(), 0)
+    except StopIteration:
+        return False
+    return (ret == root and next(hashes, None) is None)
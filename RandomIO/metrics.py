@@ -0,0 +1,189 @@
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 William T. James for Storj Labs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Opt-in instrumentation for RandomIO.  Metrics are off by default, and
+every instrumented call then costs one check of the enabled flag.  Once
+enabled, counters and a timing histogram per operation are kept for the
+whole process, and callbacks are told about each timed operation, for
+instance to feed Prometheus.
+
+The public RandomIO methods are timed under their own names.  Keystream
+generation is timed as cipher, whose bytes are the bytes generated, and
+file writes in dump() as write.  Counters hold cipher_setups, for CTR
+ciphers built at an offset, refills of the dump() and read-ahead buffers,
+and cache_hits and cache_misses for KeystreamCache lookups.
+"""
+
+import time
+import functools
+import threading
+
+enabled = False
+
+# histogram buckets are powers of two in microseconds, the last one also
+# holding everything slower
+BUCKETS = 32
+
+_lock = threading.Lock()
+_counters = {}
+_operations = {}
+_callbacks = []
+
+
+def enable():
+    """Starts collecting metrics"""
+    global enabled
+    enabled = True
+
+
+def disable():
+    """Stops collecting metrics.  What was collected is kept.
+    """
+    global enabled
+    enabled = False
+
+
+def reset():
+    """Drops all collected metrics"""
+    with _lock:
+        _counters.clear()
+        _operations.clear()
+
+
+def add_callback(func):
+    """Registers func(operation, seconds) to be called after every timed
+    operation while metrics are enabled.  It runs on the thread that made
+    the call, so it should be quick.
+    """
+    _callbacks.append(func)
+
+
+def remove_callback(func):
+    _callbacks.remove(func)
+
+
+def count(name, n=1):
+    """Adds n to a counter"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def _entry(operation):
+    entry = _operations.get(operation)
+    if (entry is None):
+        entry = _operations[operation] = {
+            'count': 0, 'seconds': 0.0, 'bytes': 0,
+            'histogram': [0] * BUCKETS}
+    return entry
+
+
+def record(operation, seconds, nbytes=0):
+    """Adds a timing for an operation on nbytes bytes and tells the
+    callbacks about it
+    """
+    bucket = min(int(seconds * 1e6).bit_length(), BUCKETS - 1)
+    with _lock:
+        entry = _entry(operation)
+        entry['count'] += 1
+        entry['seconds'] += seconds
+        entry['bytes'] += nbytes
+        entry['histogram'][bucket] += 1
+    for func in _callbacks:
+        func(operation, seconds)
+
+
+def call(operation, nbytes, func, *args):
+    """Calls func(*args), timing it as an operation on nbytes bytes"""
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        record(operation, time.perf_counter() - start, nbytes)
+
+
+def timed(operation):
+    """Decorates a method so that its calls are timed as operation while
+    metrics are enabled
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if (not enabled):
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(operation, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def stats():
+    """Returns a snapshot of the metrics.
+
+    :returns: dict of counters, a dict of counter names to values, and
+        operations, a dict of operation names to dicts of count, total
+        seconds, bytes and histogram.  histogram[i] counts calls that took
+        under 2 ** i microseconds, and at least half that
+    """
+    with _lock:
+        return {
+            'counters': dict(_counters),
+            'operations': dict(
+                (name, dict(entry, histogram=list(entry['histogram'])))
+                for (name, entry) in _operations.items()),
+        }
+
+
+def merge(snapshot):
+    """Adds a snapshot from stats(), e.g. taken in a worker process, to the
+    metrics of this process
+    """
+    with _lock:
+        for (name, n) in snapshot['counters'].items():
+            _counters[name] = _counters.get(name, 0) + n
+        for (name, other) in snapshot['operations'].items():
+            entry = _entry(name)
+            entry['count'] += other['count']
+            entry['seconds'] += other['seconds']
+            entry['bytes'] += other['bytes']
+            entry['histogram'] = [a + b for (a, b) in
+                                  zip(entry['histogram'], other['histogram'])]
+
+
+def summary(snapshot):
+    """Returns a snapshot from stats() as lines of text"""
+    lines = []
+    for (name, n) in sorted(snapshot['counters'].items()):
+        lines.append('{0}: {1}'.format(name, n))
+    for (name, entry) in sorted(snapshot['operations'].items()):
+        line = '{0}: {1} calls, {2:.3f}s, {3:.1f}us mean'.format(
+            name, entry['count'], entry['seconds'],
+            entry['seconds'] / max(entry['count'], 1) * 1e6)
+        if (entry['bytes'] > 0):
+            line += ', {0} bytes, {1:.1f}MB/s'.format(
+                entry['bytes'],
+                entry['bytes'] / max(entry['seconds'], 1e-9) / 1048576)
+        lines.append(line)
+    return '\n'.join(lines)
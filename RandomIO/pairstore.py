@@ -0,0 +1,305 @@
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 William T. James for Storj Labs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""A compact binary store of pre-generated seed-hash pairs.
+
+The file is a header, fixed-width records and a hash table.  Each record
+holds the length of a seed, the seed padded to the store's seed length,
+its 32 byte hash and a used flag.  The table is open addressed over a
+power of two number of slots, each the index of a record plus one, or
+zero if empty.  The file is mapped into memory rather than loaded, so
+opening a store of any size is immediate, lookups touch a couple of
+pages, and several processes can share one store.
+"""
+
+import os
+import sys
+import mmap
+import struct
+import hashlib
+import threading
+
+from array import array
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MAGIC = b'RIOPAIRS'
+VERSION = 1
+# magic, version, seed length, record count, table slots, pop cursor
+HEADER = struct.Struct('<8sIIQQQ')
+HEADER_SIZE = 64
+CURSOR = struct.calcsize('<8sIIQQ')
+HASH_SIZE = 32
+SLOT = struct.Struct('<I')
+
+UNUSED = b'\0'
+USED = b'\1'
+
+
+def _key(seed, seedlen):
+    """Returns the length and padded seed that start a record"""
+    return struct.pack('B', len(seed)) + seed.ljust(seedlen, b'\0')
+
+
+def _slot(seed, mask):
+    """Returns the first table slot to probe for a seed"""
+    return int.from_bytes(hashlib.blake2b(seed, digest_size=8).digest(),
+                          'little') & mask
+
+
+class PairStoreWriter(object):
+    """Writes a pair store.  Records are written to a temporary file as
+    they are added, and the table is built and the file moved into place
+    when the writer is closed, so path never holds a partial store.
+    """
+
+    def __init__(self, path, seedlen, count):
+        """Initialization method
+
+        :param path: the file to write
+        :param seedlen: the length of the longest seed, at most 255
+        :param count: the number of pairs that will be added
+        """
+        if (seedlen > 255):
+            raise ValueError('Seeds must be at most 255 bytes.')
+        self.path = path
+        self.seedlen = seedlen
+        self.count = count
+        self.added = 0
+        self.slots = 1
+        while (self.slots < 2 * count):
+            self.slots *= 2
+        self.table = array('I', bytes(SLOT.size * self.slots))
+        self.tmp = path + '.tmp'
+        self.file = open(self.tmp, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, seedlen, count,
+                                    self.slots, 0).ljust(HEADER_SIZE, b'\0'))
+
+    def add(self, seed, hash):
+        """Adds a pair
+
+        :param seed: the seed bytes
+        :param hash: the 32 byte hash of the stream for the seed
+        """
+        if (self.added >= self.count):
+            raise ValueError('Store is full.')
+        if (len(seed) > self.seedlen or len(hash) != HASH_SIZE):
+            raise ValueError('Seed or hash has the wrong length.')
+        mask = self.slots - 1
+        slot = _slot(seed, mask)
+        while (self.table[slot]):
+            slot = (slot + 1) & mask
+        self.added += 1
+        self.table[slot] = self.added
+        self.file.write(_key(seed, self.seedlen))
+        self.file.write(hash)
+        self.file.write(UNUSED)
+
+    def close(self):
+        """Writes the table and moves the store into place
+
+        :raises ValueError: if fewer pairs were added than promised, in
+            which case nothing is written to path
+        """
+        if (self.file is None):
+            return
+        if (self.added != self.count):
+            self.abort()
+            raise ValueError('Store holds {0} of {1} pairs.'.format(
+                self.added, self.count))
+        try:
+            if (sys.byteorder == 'big'):
+                self.table.byteswap()
+            self.table.tofile(self.file)
+            self.file.close()
+        except BaseException:
+            self.abort()
+            raise
+        self.file = None
+        os.replace(self.tmp, self.path)
+
+    def abort(self):
+        """Discards the store, leaving path as it was"""
+        if (self.file is None):
+            return
+        self.file.close()
+        self.file = None
+        os.remove(self.tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if (exc_type is None):
+            self.close()
+        else:
+            self.abort()
+
+
+class PairStore(object):
+    """A pair store opened for lookups and for handing out unused pairs.
+    pop() and take() are atomic between threads, and between processes
+    where fcntl is available.
+    """
+
+    def __init__(self, path, writable=True):
+        """Initialization method
+
+        :param path: the store file
+        :param writable: open for take() and pop(), not just lookups
+        """
+        self.file = open(path, 'r+b' if writable else 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=(
+            mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ))
+        if (len(self.map) < HEADER_SIZE):
+            self.close()
+            raise ValueError('Not a pair store.')
+        (magic, version, self.seedlen, self.count, self.slots,
+         cursor) = HEADER.unpack_from(self.map, 0)
+        if (magic != MAGIC or version != VERSION):
+            self.close()
+            raise ValueError('Not a pair store.')
+        self.keysz = 1 + self.seedlen
+        self.recordsz = self.keysz + HASH_SIZE + 1
+        self.table = HEADER_SIZE + self.count * self.recordsz
+        if (len(self.map) != self.table + self.slots * SLOT.size):
+            self.close()
+            raise ValueError('Pair store is truncated or corrupt.')
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def _record(self, index):
+        return HEADER_SIZE + index * self.recordsz
+
+    def _find(self, seed):
+        """Returns the offset of the record for seed, or None"""
+        if (len(seed) > self.seedlen):
+            return None
+        key = _key(seed, self.seedlen)
+        mask = self.slots - 1
+        slot = _slot(seed, mask)
+        while True:
+            index = SLOT.unpack_from(self.map, self.table +
+                                     slot * SLOT.size)[0]
+            if (index == 0):
+                return None
+            offset = self._record(index - 1)
+            if (self.map[offset:offset + self.keysz] == key):
+                return offset
+            slot = (slot + 1) & mask
+
+    def get(self, seed):
+        """Returns the hash for a seed, used or not, or None if the seed is
+        not in the store
+        """
+        offset = self._find(seed)
+        if (offset is None):
+            return None
+        offset += self.keysz
+        return self.map[offset:offset + HASH_SIZE]
+
+    def __contains__(self, seed):
+        return self._find(seed) is not None
+
+    def used(self, seed):
+        """Returns whether the pair for a seed has been handed out"""
+        offset = self._find(seed)
+        return (offset is not None and
+                self.map[offset + self.recordsz - 1:
+                         offset + self.recordsz] == USED)
+
+    def take(self, seed):
+        """Marks the pair for a seed as used.
+
+        :returns: the hash, or None if the seed is not in the store or was
+            already used
+        """
+        offset = self._find(seed)
+        if (offset is None):
+            return None
+        flag = offset + self.recordsz - 1
+        with _StoreLock(self):
+            if (self.map[flag:flag + 1] == USED):
+                return None
+            self.map[flag:flag + 1] = USED
+        return self.map[offset + self.keysz:flag]
+
+    def pop(self):
+        """Marks the next unused pair as used and returns it
+
+        :returns: tuple of the seed and its hash
+        :raises KeyError: if every pair has been used
+        """
+        with _StoreLock(self):
+            cursor = struct.unpack_from('<Q', self.map, CURSOR)[0]
+            while (cursor < self.count):
+                offset = self._record(cursor)
+                cursor += 1
+                flag = offset + self.recordsz - 1
+                if (self.map[flag:flag + 1] == UNUSED):
+                    self.map[flag:flag + 1] = USED
+                    struct.pack_into('<Q', self.map, CURSOR, cursor)
+                    return (self.map[offset + 1:offset + 1 + self.map[offset]],
+                            self.map[offset + self.keysz:flag])
+            struct.pack_into('<Q', self.map, CURSOR, cursor)
+        raise KeyError('Every pair has been used.')
+
+    def flush(self):
+        """Writes the used flags out to the file"""
+        self.map.flush()
+
+    def close(self):
+        if (self.map is not None):
+            self.map.close()
+            self.file.close()
+            self.map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class _StoreLock(object):
+    """Holds the store's thread lock and, where fcntl is available, an
+    exclusive lock on the file
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __enter__(self):
+        self.store.lock.acquire()
+        if (fcntl is not None):
+            fcntl.flock(self.store.file.fileno(), fcntl.LOCK_EX)
+
+    def __exit__(self, *args):
+        if (fcntl is not None):
+            fcntl.flock(self.store.file.fileno(), fcntl.LOCK_UN)
+        self.store.lock.release()
@@ -0,0 +1,249 @@
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 William T. James for Storj Labs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+
+from array import array
+
+from . import backends
+from . import metrics
+from .RandomIO import RandomIO, _derive_key, _key_schedule
+
+KEY_SIZE = 32
+# no bytes are buffered before the first read
+EMPTY = (1 << 64) - 1
+
+
+class RandomIOPool(object):
+    """Many logical RandomIO streams, each a seed and a position, kept in a
+    few flat arrays instead of one object and cipher per stream.  Each
+    stream takes its 32 byte key, its 8 byte position, the 8 byte offset of
+    its read-ahead window and the window itself, so 48 bytes plus ahead,
+    80 bytes by default.  Streams are referred to by their index.
+
+    A read that misses a stream's window runs the cipher once, for the
+    bytes read and the next ahead bytes, so a series of small reads costs
+    one cipher call per ahead bytes.  Expanded keys come from the cache
+    that RandomIO streams share, so refills of recently used streams skip
+    key expansion.  read_many() reads from many streams at once into a
+    single buffer, and the counter blocks fed to the cipher are shared by
+    every stream refilled at the same offset.
+    """
+
+    def __init__(self, seeds=(), size=None, backend=None, ahead=32):
+        """Initialization method
+
+        :param seeds: the seeds of the first streams, see add()
+        :param size: the size of every stream, or None for unbounded
+        :param backend: the name of the keystream backend to use, or a
+            backend instance.  if none, the fastest available backend is used
+        :param ahead: the number of bytes buffered per stream
+        """
+        self.size = size
+        self.backend = backends.get(backend)
+        self.ahead = ahead
+        self.keys = bytearray()
+        self.positions = array('Q')
+        self.starts = array('Q')
+        self.buffer = bytearray()
+        self._counters = {}
+        for seed in seeds:
+            self.add(seed)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add(self, seed=None, offset=0):
+        """Adds a stream, the same as RandomIO(seed) seeked to offset
+
+        :param seed: the seed, as for RandomIO.  if none, a random one
+        :param offset: the starting position
+        :returns: the index of the new stream
+        """
+        if (seed is None):
+            seed = os.urandom(32)
+        return self.add_key(_derive_key(seed), offset)
+
+    def add_key(self, key, offset=0):
+        """Adds a stream from a derived key, as RandomIO.from_key()
+
+        :param key: the 32 byte cipher key
+        :param offset: the starting position
+        :returns: the index of the new stream
+        """
+        if (len(key) != KEY_SIZE):
+            raise ValueError('Keys must be {0} bytes.'.format(KEY_SIZE))
+        if (offset < 0):
+            raise ValueError('Negative seek position {0}.'.format(offset))
+        self.keys += key
+        self.positions.append(offset)
+        self.starts.append(EMPTY)
+        self.buffer += bytes(self.ahead)
+        return len(self.positions) - 1
+
+    def key(self, index):
+        """Returns the cipher key of a stream"""
+        return bytes(self.keys[index * KEY_SIZE:(index + 1) * KEY_SIZE])
+
+    def stream(self, index):
+        """Returns a RandomIO object for a stream, at the same position"""
+        s = RandomIO.from_key(self.key(index), self.size, self.backend)
+        s.seek(self.positions[index])
+        return s
+
+    def tell(self, index):
+        return self.positions[index]
+
+    def seek(self, index, offset, whence=os.SEEK_SET):
+        """Moves a stream, like RandomIO.seek().  The read-ahead window is
+        kept, so seeking back into it costs nothing.
+
+        :returns: the new absolute offset
+        """
+        if (whence == os.SEEK_CUR):
+            offset += self.positions[index]
+        elif (whence == os.SEEK_END):
+            if (self.size is None):
+                raise RuntimeError('Cannot seek from end of stream if size'
+                                   ' is unknown.')
+            offset += self.size
+        elif (whence != os.SEEK_SET):
+            raise ValueError('Invalid whence {0}.'.format(whence))
+        if (offset < 0):
+            raise ValueError('Negative seek position {0}.'.format(offset))
+        self.positions[index] = offset
+        return offset
+
+    def _interpret_size(self, size, offset):
+        if (size is not None and size < 0):
+            size = None
+        if (self.size is not None):
+            if (size is None or offset + size > self.size):
+                size = max(self.size - offset, 0)
+        elif (size is None):
+            raise RuntimeError('Stream size must be specified if bytes'
+                               ' to read is not.')
+        return size
+
+    def read(self, index, size=None):
+        """Reads from a stream, as RandomIO.read()
+
+        :param index: the stream to read
+        :param size: the number of bytes to read.  if none, reads to the end
+        :returns: the bytes read
+        """
+        pos = self.positions[index]
+        size = self._interpret_size(size, pos)
+        start = self.starts[index]
+        if (start <= pos and pos + size <= start + self.ahead):
+            base = index * self.ahead + pos - start
+            self.positions[index] = pos + size
+            return bytes(self.buffer[base:base + size])
+        buf = bytearray(size)
+        with memoryview(self.buffer) as windows:
+            self._read_into(index, pos, memoryview(buf), windows)
+        return bytes(buf)
+
+    def read_many(self, indices, size):
+        """Reads size bytes from each of many streams, as read() would for
+        each in turn
+
+        :param indices: the streams to read, in the order of the rows
+        :param size: the number of bytes to read from each
+        :returns: a memoryview of shape (len(indices), size) over a
+            bytearray, or a flat empty memoryview if either is zero.  rows
+            for streams that end sooner are zero padded
+        """
+        if (size < 0):
+            raise ValueError('Size must not be negative.')
+        indices = list(indices)
+        buf = memoryview(bytearray(len(indices) * size))
+        if (len(buf) < 1):
+            return buf
+        ahead = self.ahead
+        positions = self.positions
+        starts = self.starts
+        limit = self.size
+        row = 0
+        with memoryview(self.buffer) as windows:
+            for index in indices:
+                pos = positions[index]
+                n = size
+                if (limit is not None and pos + n > limit):
+                    n = max(limit - pos, 0)
+                start = starts[index]
+                if (start <= pos and pos + n <= start + ahead):
+                    base = index * ahead + pos - start
+                    buf[row:row + n] = windows[base:base + n]
+                    positions[index] = pos + n
+                else:
+                    self._read_into(index, pos, buf[row:row + n], windows)
+                row += size
+        return buf.cast('B', [len(indices), size])
+
+    def _read_into(self, index, pos, view, windows):
+        """Fills view from a stream at pos, using what is left of its
+        window and refilling it with the bytes that follow
+
+        :param windows: a memoryview of the buffer of every window
+        """
+        ahead = self.ahead
+        start = self.starts[index]
+        window = index * ahead
+        done = 0
+        if (start <= pos < start + ahead):
+            done = start + ahead - pos
+            view[:done] = windows[window + pos - start:window + ahead]
+        need = len(view) - done
+        data = self._keystream(index, pos + done, need + ahead)
+        view[done:] = data[:need]
+        windows[window:window + ahead] = data[need:]
+        self.starts[index] = pos + len(view)
+        self.positions[index] = pos + len(view)
+
+    def _keystream(self, index, offset, size):
+        """Returns size bytes of keystream for a stream from offset, from
+        one cipher call
+        """
+        if (metrics.enabled):
+            metrics.count('pool_refills')
+        key = bytes(self.keys[index * KEY_SIZE:(index + 1) * KEY_SIZE])
+        # the expanded key comes from the schedule cache RandomIO streams
+        # share, so recently used streams skip key expansion
+        ecb = _key_schedule(self.backend, key)
+        block = offset // 16
+        skip = offset % 16
+        count = (skip + size + 15) // 16
+        if (count > 64):
+            aes = self.backend.ctr(key, block, ecb)
+            if (skip > 0):
+                aes.keystream(skip)
+            return aes.keystream(size)
+        blocks = self._counters.get((block, count))
+        if (blocks is None):
+            if (len(self._counters) >= 1024):
+                self._counters.clear()
+            blocks = self._counters[(block, count)] = (
+                RandomIO._counter_blocks(block, count))
+        return memoryview(ecb.encrypt(blocks))[skip:skip + size]
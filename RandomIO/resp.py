@@ -0,0 +1,206 @@
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 William T. James for Storj Labs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""Bulk output of seed-hash pairs in the Redis protocol.
+
+Commands are encoded straight into one reusable buffer and written out in
+batches, either to a file for `redis-cli --pipe` or to a socket connected
+to a Redis server.  On a socket every batch is pipelined: it is sent
+whole, and its replies are read only after the next batch has been sent,
+so the server is never waiting on the client.
+"""
+
+import socket
+
+LAYOUTS = ('set', 'mset', 'hset')
+
+
+def _bulk(value):
+    """Returns a value encoded as a Redis bulk string"""
+    if (isinstance(value, str)):
+        value = value.encode('ascii')
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+def connect(host='localhost', port=6379):
+    """Returns a socket connected to a Redis server, for RedisWriter
+
+    :param host: the server host name, or the path of a Unix socket
+    :param port: the server port, unused for a Unix socket
+    """
+    if (host.startswith('/')):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(host)
+    else:
+        sock = socket.create_connection((host, port))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+class RedisWriter(object):
+    """Writes seed-hash pairs as Redis commands.
+
+    With the 'set' layout each pair is its own key, set with `SET` and an
+    optional `EX`.  With 'mset' each batch is a single `MSET`, followed by
+    an `EXPIRE` per key if there is a TTL.  With 'hset' the pairs are the
+    fields of one hash, `key`, each batch a single `HSET` followed by an
+    `EXPIRE` of the hash if there is a TTL.
+    """
+
+    def __init__(self, out, layout='set', key=b'pairs', ttl=None,
+                 batch=1000):
+        """Initialization method
+
+        :param out: a binary file object, or a socket connected to Redis,
+            closed along with the writer
+        :param layout: one of 'set', 'mset' or 'hset'
+        :param key: the hash to write fields to with the 'hset' layout
+        :param ttl: seconds until the keys expire, or None to keep them
+        :param batch: the number of pairs written out at once
+        """
+        if (layout not in LAYOUTS):
+            raise ValueError('Layout must be one of: {0}.'.format(
+                ', '.join(LAYOUTS)))
+        self.out = out
+        self.layout = layout
+        self.key = _bulk(key)
+        self.ttl = None if ttl is None else _bulk(str(ttl))
+        self.batch = batch
+        # commands are encoded into buffer, and the arguments of a
+        # batch's MSET or HSET into args
+        self.buffer = bytearray()
+        self.args = bytearray()
+        self.pending = 0
+        self.commands = 0
+        self.inflight = 0
+        self.prefixes = {}
+        self.sock = out if isinstance(out, socket.socket) else None
+        self.replies = None
+        if (self.sock is not None):
+            self.replies = self.sock.makefile('rb')
+        if (layout == 'set'):
+            self.head = b'*%d\r\n$3\r\nSET\r\n' % (3 if ttl is None else 5)
+            self.tail = b'' if ttl is None else b'$2\r\nEX\r\n' + self.ttl
+
+    def add(self, seed, hash):
+        """Adds a pair
+
+        :param seed: the key, usually the hex-encoded seed, str or bytes
+        :param hash: the value, usually the hex-encoded hash, str or bytes
+        """
+        if (isinstance(seed, str)):
+            seed = seed.encode('ascii')
+        if (isinstance(hash, str)):
+            hash = hash.encode('ascii')
+        # seeds and hashes are nearly always the same lengths, so their
+        # length prefixes are encoded once
+        prefixes = self.prefixes
+        seedlen = prefixes.get(len(seed)) or self._prefix(len(seed))
+        hashlen = prefixes.get(len(hash)) or self._prefix(len(hash))
+        if (self.layout == 'set'):
+            self.buffer += b''.join((self.head, seedlen, seed, b'\r\n',
+                                     hashlen, hash, b'\r\n', self.tail))
+            self.commands += 1
+        else:
+            self.args += b''.join((seedlen, seed, b'\r\n',
+                                   hashlen, hash, b'\r\n'))
+            if (self.layout == 'mset' and self.ttl is not None):
+                self.buffer += b''.join((b'*3\r\n$6\r\nEXPIRE\r\n',
+                                         seedlen, seed, b'\r\n', self.ttl))
+                self.commands += 1
+        self.pending += 1
+        if (self.pending >= self.batch):
+            self.flush()
+
+    def _prefix(self, length):
+        self.prefixes[length] = b'$%d\r\n' % length
+        return self.prefixes[length]
+
+    def flush(self):
+        """Writes out the pairs added so far"""
+        if (self.pending == 0):
+            return
+        if (self.layout == 'mset'):
+            data = (b'*%d\r\n$4\r\nMSET\r\n' % (1 + 2 * self.pending) +
+                    self.args + self.buffer)
+            self.commands += 1
+        elif (self.layout == 'hset'):
+            data = (b'*%d\r\n$4\r\nHSET\r\n' % (2 + 2 * self.pending) +
+                    self.key + self.args)
+            self.commands += 1
+            if (self.ttl is not None):
+                data += b'*3\r\n$6\r\nEXPIRE\r\n' + self.key + self.ttl
+                self.commands += 1
+        else:
+            data = self.buffer
+        if (self.sock is not None):
+            self.sock.sendall(data)
+            # read the replies to the previous batch while Redis works on
+            # this one
+            self._read_replies(self.inflight)
+            self.inflight = self.commands
+        else:
+            self.out.write(data)
+        del self.buffer[:]
+        del self.args[:]
+        self.pending = 0
+        self.commands = 0
+
+    def _read_replies(self, count):
+        """Reads the replies to count commands, raising the first error
+
+        :raises IOError: if Redis replied with an error
+        """
+        error = None
+        for i in range(count):
+            reply = self.replies.readline()
+            if (not reply):
+                raise IOError('Redis closed the connection.')
+            if (reply.startswith(b'-') and error is None):
+                error = reply[1:].rstrip().decode('utf-8', 'replace')
+        if (error is not None):
+            raise IOError('Redis replied: {0}'.format(error))
+
+    def close(self):
+        """Writes out the remaining pairs, on a socket waits for Redis to
+        reply to every command, and closes the file or socket
+        """
+        if (self.out is None):
+            return
+        try:
+            self.flush()
+            if (self.sock is not None):
+                (inflight, self.inflight) = (self.inflight, 0)
+                self._read_replies(inflight)
+        finally:
+            if (self.replies is not None):
+                self.replies.close()
+            self.out.close()
+            self.out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
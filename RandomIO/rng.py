@@ -0,0 +1,119 @@
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 William T. James for Storj Labs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Deterministic random numbers drawn from a RandomIO stream.  Values are
+built from little endian 64 bit words of the keystream, so the same seed
+and stream position give the same values on every platform.  Integers in
+a range are drawn without modulo bias by rejecting the few words above
+the largest multiple of the range.
+"""
+
+import sys
+
+from array import array
+
+WORD = 8
+RANGE = 1 << 64
+
+
+def random_raw(stream, n):
+    """Returns the next n 64 bit words of the stream as an array('Q')"""
+    data = stream.read(n * WORD)
+    if (len(data) < n * WORD):
+        raise RuntimeError('Not enough bytes left in the stream.')
+    words = array('Q')
+    words.frombytes(data)
+    if (sys.byteorder == 'big'):
+        words.byteswap()
+    return words
+
+
+def _bounded(stream, n, span):
+    """Returns n integers in [0, span) for span up to 2 ** 64"""
+    if (span < 1 or span > RANGE):
+        raise ValueError('Range must hold between 1 and 2 ** 64 values.')
+    if (span & (span - 1) == 0):
+        mask = span - 1
+        return [w & mask for w in random_raw(stream, n)]
+    # words at or above limit would make the low values more likely
+    limit = RANGE - RANGE % span
+    ret = []
+    while (len(ret) < n):
+        ret.extend([w % span for w in random_raw(stream, n - len(ret))
+                    if w < limit])
+    return ret
+
+
+def randints(stream, n, low, high):
+    """Returns n integers drawn uniformly from [low, high)"""
+    return [low + v for v in _bounded(stream, n, high - low)]
+
+
+def random_floats(stream, n):
+    """Returns n floats drawn uniformly from [0, 1), each from the top 53
+    bits of a word
+    """
+    scale = 1.0 / (1 << 53)
+    return [(w >> 11) * scale for w in random_raw(stream, n)]
+
+
+def choice(stream, seq, k=None):
+    """Returns an element of seq, or a list of k elements drawn with
+    replacement if k is given
+    """
+    if (len(seq) < 1):
+        raise IndexError('Cannot choose from an empty sequence.')
+    if (k is None):
+        return seq[_bounded(stream, 1, len(seq))[0]]
+    return [seq[i] for i in _bounded(stream, k, len(seq))]
+
+
+def shuffle(stream, items):
+    """Shuffles a mutable sequence in place with the Fisher-Yates method"""
+    n = len(items)
+    if (n < 2):
+        return
+    words = random_raw(stream, n - 1)
+    for (i, w) in zip(range(n - 1, 0, -1), words):
+        span = i + 1
+        limit = RANGE - RANGE % span
+        while (w >= limit):
+            w = random_raw(stream, 1)[0]
+        j = w % span
+        items[i], items[j] = items[j], items[i]
+
+
+def numpy_generator(stream):
+    """Returns a numpy.random.Generator seeded from the next 32 bytes of the
+    stream.  NumPy bit generators are implemented in C, so the generator
+    runs PCG64 from that seed rather than drawing on the keystream itself;
+    it is still reproducible from the seed and stream position.
+    """
+    # imported here, as NumPy takes longer to load than the package itself
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError('NumPy is not installed.')
+    entropy = [int(w) for w in random_raw(stream, 4)]
+    return numpy.random.Generator(
+        numpy.random.PCG64(numpy.random.SeedSequence(entropy)))
@@ -0,0 +1,122 @@
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 William T. James for Storj Labs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from .cache import KeystreamCache
+
+# the most bytes generated at once for a slice with a step
+STRIDE_CHUNK = 1048576
+
+
+class RandomView(object):
+    """A virtual, read-only file over a RandomIO stream that can be indexed
+    and sliced like bytes or mmap.  Nothing is generated up front: each
+    access generates just the bytes it covers straight from their offset.
+    Reads of up to a page go through a small LRU cache of pages, so
+    repeated small reads near each other run the cipher once.  The stream
+    position is not used.
+    """
+
+    def __init__(self, stream, size=None, pagesz=4096, pages=64):
+        """Initialization method
+
+        :param stream: the RandomIO stream to view
+        :param size: the length of the view.  defaults to the stream size
+        :param pagesz: the size of the pages kept for small reads
+        :param pages: the most pages to keep
+        """
+        if (size is None):
+            size = stream.size
+        if (size is None):
+            raise RuntimeError('View size must be specified if the stream'
+                               ' size is unknown.')
+        self.stream = stream
+        self.size = size
+        self.cache = KeystreamCache(pagesz * pages, pagesz)
+
+    def __len__(self):
+        return self.size
+
+    def _get(self, offset, size):
+        """Returns size bytes of the stream from offset"""
+        if (size < 1):
+            return bytes()
+        if (size > self.cache.blocksz):
+            return self.stream._generate(offset, size)
+        return b''.join(self.stream._cached(offset, size, self.cache))
+
+    def __getitem__(self, key):
+        if (isinstance(key, slice)):
+            indices = range(*key.indices(self.size))
+            if (len(indices) < 1):
+                return bytes()
+            if (indices.step == 1):
+                return self._get(indices.start, len(indices))
+            if (indices.step < 0):
+                return self._strided(indices[::-1])[::-1]
+            return self._strided(indices)
+        index = key.__index__()
+        if (index < 0):
+            index += self.size
+        if (index < 0 or index >= self.size):
+            raise IndexError('View index out of range.')
+        return self._get(index, 1)[0]
+
+    def _strided(self, indices):
+        """Returns the bytes at a range of offsets with a step above one.
+        Steps wider than a page generate each byte on its own, narrower ones
+        generate the span in chunks, so memory stays bounded either way.
+        """
+        step = indices.step
+        if (step > self.cache.blocksz):
+            return bytes(self.stream._generate(i, 1)[0] for i in indices)
+        ret = bytearray()
+        end = indices[-1] + 1
+        chunk = max(1, STRIDE_CHUNK // step) * step
+        for offset in range(indices.start, end, chunk):
+            ret += self._get(offset, min(chunk, end - offset))[::step]
+        return bytes(ret)
+
+    def __iter__(self):
+        for offset in range(0, self.size, self.cache.blocksz):
+            for byte in self._get(offset, min(self.cache.blocksz,
+                                              self.size - offset)):
+                yield byte
+
+    def __bytes__(self):
+        return self._get(0, self.size)
+
+    def readinto(self, offset, b):
+        """Copies bytes from an offset of the view into a writable buffer
+        without caching them.
+
+        :param offset: the offset in the view
+        :param b: the writable buffer to fill
+        :returns: the number of bytes written into b
+        """
+        if (offset < 0):
+            raise ValueError('Offset must not be negative.')
+        view = memoryview(b).cast('B')
+        size = max(0, min(len(view), self.size - offset))
+        if (size > 0):
+            self.stream._keystream_at(offset, view[:size])
+        return size
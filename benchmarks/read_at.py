@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 William T. James for Storj Labs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Compares positional read_at() against seek() followed by read() for
+random offsets into a large virtual file.
+
+    python benchmarks/read_at.py
+"""
+
+import os
+import sys
+import random
+import timeit
+
+# run from a checkout without installing
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import RandomIO  # NOQA
+
+VIRTUAL_SIZE = 10 * 1024 ** 3
+READ_SIZES = [64, 4096, 1048576]
+
+
+def main(reads=200, repeat=3):
+    stream = RandomIO.RandomIO('benchmark seed')
+    rng = random.Random(0)
+
+    print('{0:>10} {1:>16} {2:>16} {3:>8}'.format(
+        'size', 'seek+read (us)', 'read_at (us)', 'speedup'))
+    for size in READ_SIZES:
+        offsets = [rng.randrange(VIRTUAL_SIZE - size) for i in range(reads)]
+
+        def seek_read():
+            for offset in offsets:
+                stream.seek(offset)
+                stream.read(size)
+
+        def read_at():
+            for offset in offsets:
+                stream.read_at(offset, size)
+
+        t1 = min(timeit.repeat(seek_read, number=1, repeat=repeat)) / reads
+        t2 = min(timeit.repeat(read_at, number=1, repeat=repeat)) / reads
+        print('{0:>10} {1:>16.2f} {2:>16.2f} {3:>7.2f}x'.format(
+            size, t1 * 1e6, t2 * 1e6, t1 / t2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,472 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 William T. James for Storj Labs
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Benchmark suite for RandomIO.
+
+Each benchmark runs in its own process so the peak resident set size it
+reports belongs to that operation alone.  Results are printed and can be
+saved as JSON and compared against an earlier run:
+
+    python benchmarks/run.py -o before.json
+    python benchmarks/run.py -o after.json --compare before.json
+
+Use --quick for a fast smoke run and -k to select benchmarks by name.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+
+from queue import Empty
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import RandomIO  # NOQA
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+MB = 1048576
+BENCHMARKS = []
+
+
+def benchmark(func):
+    """Registers a benchmark.  Benchmarks take the scale factor, 1 for a
+    full run, and return a dict of metrics.
+    """
+    BENCHMARKS.append(func)
+    return func
+
+
+def _tmpdir():
+    """Returns a directory on tmpfs when there is one"""
+    if (os.path.isdir('/dev/shm')):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+def _scaled(n, scale):
+    return max(1, int(n * scale))
+
+
+def _throughput(nbytes, seconds):
+    return {'seconds': seconds, 'mb_per_s': nbytes / seconds / MB}
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    ret = {}
+    for p in [50, 90, 99]:
+        index = min(len(samples) - 1, len(samples) * p // 100)
+        ret['p{0}_us'.format(p)] = samples[index] * 1e6
+    return ret
+
+
+def _read(size, scale):
+    total = max(_scaled(64 * MB, scale), size)
+    stream = RandomIO.RandomIO('benchmark seed')
+    start = time.time()
+    for i in range(total // size):
+        stream.read(size)
+    return _throughput(total // size * size, time.time() - start)
+
+
+@benchmark
+def read_16(scale):
+    return _read(16, scale / 64)
+
+
+@benchmark
+def pool_read_16(scale):
+    """16 byte reads spread over 10000 streams, read_16 for many clients"""
+    pool = RandomIO.RandomIOPool(str(i) for i in range(10000))
+    rounds = max(1, _scaled(40, scale))
+    start = time.time()
+    for i in range(rounds):
+        pool.read_many(range(len(pool)), 16)
+    return _throughput(rounds * len(pool) * 16, time.time() - start)
+
+
+@benchmark
+def read_4k(scale):
+    return _read(4096, scale)
+
+
+@benchmark
+def read_1m(scale):
+    return _read(MB, scale)
+
+
+@benchmark
+def read_16m(scale):
+    return _read(16 * MB, scale)
+
+
+@benchmark
+def readinto_1m(scale):
+    total = _scaled(64, scale) * MB
+    stream = RandomIO.RandomIO('benchmark seed')
+    buf = bytearray(MB)
+    start = time.time()
+    for i in range(total // MB):
+        stream.readinto(buf)
+    return _throughput(total, time.time() - start)
+
+
+@benchmark
+def dump(scale):
+    size = _scaled(256 * MB, scale)
+    path = os.path.join(_tmpdir(), 'randomio-benchmark-dump')
+    try:
+        with open(path, 'wb') as f:
+            start = time.time()
+            RandomIO.RandomIO('benchmark seed').dump(f, size)
+            elapsed = time.time() - start
+    finally:
+        os.remove(path)
+    return _throughput(size, elapsed)
+
+
+@benchmark
+def dump_64k(scale):
+    size = _scaled(256 * MB, scale)
+    path = os.path.join(_tmpdir(), 'randomio-benchmark-dump')
+    try:
+        with open(path, 'wb') as f:
+            start = time.time()
+            RandomIO.RandomIO('benchmark seed').dump(f, size, bufsz=65536)
+            elapsed = time.time() - start
+    finally:
+        os.remove(path)
+    return _throughput(size, elapsed)
+
+
+@benchmark
+def genfile(scale):
+    size = _scaled(256 * MB, scale)
+    path = os.path.join(_tmpdir(), 'randomio-benchmark-genfile')
+    try:
+        start = time.time()
+        RandomIO.RandomIO('benchmark seed').genfile(size, path)
+        elapsed = time.time() - start
+    finally:
+        os.remove(path)
+    return _throughput(size, elapsed)
+
+
+def _workers():
+    return max(2, multiprocessing.cpu_count())
+
+
+@benchmark
+def dump_parallel(scale):
+    size = _scaled(256 * MB, scale)
+    path = os.path.join(_tmpdir(), 'randomio-benchmark-dump')
+    try:
+        with open(path, 'wb') as f:
+            start = time.time()
+            RandomIO.RandomIO('benchmark seed').dump(f, size, _workers())
+            elapsed = time.time() - start
+    finally:
+        os.remove(path)
+    return _throughput(size, elapsed)
+
+
+@benchmark
+def genfile_parallel(scale):
+    size = _scaled(256 * MB, scale)
+    path = os.path.join(_tmpdir(), 'randomio-benchmark-genfile')
+    try:
+        start = time.time()
+        RandomIO.RandomIO('benchmark seed').genfile(size, path, _workers())
+        elapsed = time.time() - start
+    finally:
+        os.remove(path)
+    return _throughput(size, elapsed)
+
+
+def _latency(read, scale):
+    rng = random.Random(0)
+    samples = []
+    for i in range(max(100, _scaled(10000, scale))):
+        offset = rng.randrange(1 << 40)
+        start = time.time()
+        read(offset)
+        samples.append(time.time() - start)
+    return _percentiles(samples)
+
+
+@benchmark
+def seek_read_16(scale):
+    stream = RandomIO.RandomIO('benchmark seed')
+
+    def read(offset):
+        stream.seek(offset)
+        stream.read(16)
+    return _latency(read, scale)
+
+
+@benchmark
+def seek_read_16_cached(scale):
+    stream = RandomIO.RandomIO('benchmark seed',
+                               cache=RandomIO.KeystreamCache())
+    # a hot set of 256 offsets, as in repeated audits of the same seed
+    hot = [random.Random(1).randrange(1 << 40) for i in range(256)]
+
+    def read(offset):
+        stream.seek(hot[offset % len(hot)])
+        stream.read(16)
+    return _latency(read, scale)
+
+
+@benchmark
+def read_at_16(scale):
+    stream = RandomIO.RandomIO('benchmark seed')
+    return _latency(lambda offset: stream.read_at(offset, 16), scale)
+
+
+def _construct(make, scale):
+    count = _scaled(20000, scale)
+    start = time.time()
+    for i in range(count):
+        make(i)
+    elapsed = time.time() - start
+    return {'seconds': elapsed, 'objects_per_s': count / elapsed}
+
+
+@benchmark
+def construct(scale):
+    return _construct(lambda i: RandomIO.RandomIO(i).read(32), scale)
+
+
+@benchmark
+def construct_hot(scale):
+    # a hot set of 256 seeds, as when streams are rebuilt for each request
+    return _construct(lambda i: RandomIO.RandomIO(i % 256).read(32), scale)
+
+
+@benchmark
+def construct_key(scale):
+    if (not hasattr(RandomIO.RandomIO, 'from_key')):
+        return {}
+    keys = [os.urandom(32) for i in range(256)]
+    return _construct(
+        lambda i: RandomIO.RandomIO.from_key(keys[i % 256]).read(32), scale)
+
+
+@benchmark
+def pairgen(scale):
+    pairs = max(4, _scaled(40, scale))
+    output = os.path.join(_tmpdir(), 'randomio-benchmark-pairs')
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [ROOT] + [p for p in [env.get('PYTHONPATH')] if p])
+    start = time.time()
+    try:
+        subprocess.check_call(
+            [sys.executable, os.path.join(ROOT, 'bin', 'IOTools.py'),
+             'pairgen', str(MB), '-p', str(pairs), '-o', output], env=env)
+        elapsed = time.time() - start
+    finally:
+        if (os.path.exists(output)):
+            os.remove(output)
+    return {'seconds': elapsed, 'pairs_per_s': pairs / elapsed}
+
+
+def _iotools(args, runs):
+    """Returns the mean and fastest seconds taken by IOTools.py runs"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [ROOT] + [p for p in [env.get('PYTHONPATH')] if p])
+    times = []
+    with open(os.devnull, 'w') as devnull:
+        for i in range(runs):
+            start = time.time()
+            subprocess.check_call(
+                [sys.executable, os.path.join(ROOT, 'bin', 'IOTools.py')] +
+                args, env=env, stdout=devnull)
+            times.append(time.time() - start)
+    return {'seconds': sum(times) / runs, 'min_seconds': min(times)}
+
+
+@benchmark
+def startup_help(scale):
+    return _iotools(['--help'], max(3, _scaled(20, scale)))
+
+
+@benchmark
+def startup_pairgen(scale):
+    output = os.path.join(_tmpdir(), 'randomio-benchmark-pairs')
+    try:
+        return _iotools(['pairgen', '1000', '-p', '1', '-o', output],
+                        max(3, _scaled(20, scale)))
+    finally:
+        if (os.path.exists(output)):
+            os.remove(output)
+
+
+@benchmark
+def serve_pairgen(scale):
+    """The same job as startup_pairgen, sent to a running server"""
+    import threading
+    path = os.path.join(_tmpdir(), 'randomio-benchmark.sock')
+    server = RandomIO.daemon.Server(path, jobs=1)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        runs = max(100, _scaled(2000, scale))
+        start = time.time()
+        for i in range(runs):
+            list(RandomIO.daemon.request(
+                {'op': 'pairgen', 'size': 1000, 'pairs': 1}, path))
+        elapsed = time.time() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+    return {'seconds': elapsed / runs, 'requests_per_s': runs / elapsed}
+
+
+def _peak_rss_kb():
+    if (resource is None):
+        return None
+    # include children so subprocess benchmarks such as pairgen count
+    rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+              resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    if (sys.platform == 'darwin'):
+        # reported in bytes rather than kilobytes
+        rss //= 1024
+    return rss
+
+
+def _child(func, scale, queue):
+    try:
+        result = func(scale)
+        result['peak_rss_kb'] = _peak_rss_kb()
+    except Exception as ex:
+        result = {'error': repr(ex)}
+    queue.put(result)
+
+
+def run(func, scale):
+    """Runs a benchmark in a fresh process and returns its metrics"""
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_child,
+                                      args=(func, scale, queue))
+    process.start()
+    while True:
+        try:
+            result = queue.get(timeout=1)
+            break
+        except Empty:
+            if (process.exitcode is not None):
+                # died without reporting, e.g. killed for running out of
+                # memory
+                result = {'error': 'exit code {0}'.format(process.exitcode)}
+                break
+    process.join()
+    return result
+
+
+def _commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            stderr=subprocess.STDOUT).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _format(result):
+    return ', '.join('{0}={1:.2f}'.format(k, v) if isinstance(v, float)
+                     else '{0}={1}'.format(k, v)
+                     for (k, v) in sorted(result.items()))
+
+
+def compare(base, results):
+    """Prints the ratio of each metric against a baseline run"""
+    print('\ncompared to {0}:'.format(base.get('commit')))
+    for (name, result) in sorted(results.items()):
+        old = base['results'].get(name)
+        if (old is None):
+            continue
+        ratios = []
+        for (key, value) in sorted(result.items()):
+            if (key == 'seconds' or not old.get(key) or value is None):
+                continue
+            ratios.append('{0} x{1:.2f}'.format(key, value / old[key]))
+        print('{0:>14}: {1}'.format(name, ', '.join(ratios)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark RandomIO.')
+    parser.add_argument(
+        '-o', '--output', type=str, help='Write results to this JSON file.')
+    parser.add_argument(
+        '-c', '--compare', type=str, help='Compare against a JSON file.')
+    parser.add_argument(
+        '-k', type=str, help='Only run benchmarks containing this string.')
+    parser.add_argument(
+        '-q', '--quick', action='store_true', help='Run a scaled down suite.')
+    args = parser.parse_args()
+
+    scale = 1.0 / 16 if args.quick else 1
+    results = {}
+    for func in BENCHMARKS:
+        if (args.k and args.k not in func.__name__):
+            continue
+        result = run(func, scale)
+        print('{0:>14}: {1}'.format(func.__name__, _format(result)))
+        results[func.__name__] = result
+
+    report = {
+        'commit': _commit(),
+        'time': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backend': RandomIO.backends.get().name,
+        'quick': args.quick,
+        'results': results,
+    }
+    if (args.output):
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if (args.compare):
+        with open(args.compare, 'r') as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -32,9 +32,13 @@ with open('RandomIO/version.py', 'r') as f:
 LONG_DESCRIPTION = open('README.md').read()
 
 install_requirements = [
-    'pycrypto >= 2.6.1'
+    'pycryptodome >= 3.4'
 ]
 
+extra_requirements = {
+    'openssl': ['cryptography >= 1.0']
+}
+
 test_requirements = [
     'redis>=2.10.3',
     'pytest>=2.6.4',
@@ -75,9 +79,13 @@ setup(
     description='Random file and byte string generator.',
     long_description=LONG_DESCRIPTION,
     packages=['RandomIO'],
+    python_requires='>=3.6',
     cmdclass={'test': PyTest},
     install_requires=install_requirements,
+    extras_require=extra_requirements,
     tests_require=test_requirements,
     keywords=['storj', 'randomIO', 'random generator'],
-    scripts=['bin/IOTools.py'],
+    entry_points={
+        'console_scripts': ['IOTools.py = RandomIO.cli:main'],
+    },
 )
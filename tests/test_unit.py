@@ -24,13 +24,24 @@
 # SOFTWARE.
 
 import unittest
+import gc
+import io
+import asyncio
 import os
 import redis
 import hashlib
 import subprocess
 import binascii
+import socket
+import sys
+import shutil
+import tempfile
+import threading
+import warnings
+import tracemalloc
 
 import RandomIO
+from multiprocessing.pool import ThreadPool
 from sys import platform as _platform
 
 if _platform.startswith('linux') or _platform == 'darwin':
@@ -41,6 +52,63 @@ elif _platform == 'win32':
     iotools_call = ['python', os.path.join('bin', 'IOTools.py')]
 
 
+def resp_commands(f):
+    """Yields the commands read from a file of Redis protocol"""
+    while True:
+        line = f.readline()
+        if (not line):
+            return
+        command = []
+        for i in range(int(line[1:])):
+            length = int(f.readline()[1:])
+            command.append(f.read(length + 2)[:-2])
+        yield command
+
+
+class RedisStandIn(threading.Thread):
+    """Accepts one connection and answers the SET, MSET, HSET and EXPIRE
+    commands sent on it like Redis would, keeping the keys in data, or
+    refuses every command if readonly
+    """
+
+    def __init__(self, readonly=False):
+        threading.Thread.__init__(self, daemon=True)
+        self.readonly = readonly
+        self.listener = socket.socket()
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(1)
+        self.port = self.listener.getsockname()[1]
+        self.data = {}
+        self.ttls = {}
+        self.start()
+
+    def run(self):
+        (conn, addr) = self.listener.accept()
+        with conn, conn.makefile('rb') as f:
+            for command in resp_commands(f):
+                (name, args) = (command[0].upper(), command[1:])
+                if (self.readonly):
+                    conn.sendall(b'-READONLY replica\r\n')
+                elif (name == b'SET'):
+                    self.data[args[0]] = args[1]
+                    if (len(args) == 4):
+                        self.ttls[args[0]] = int(args[3])
+                    conn.sendall(b'+OK\r\n')
+                elif (name == b'MSET'):
+                    self.data.update(zip(args[::2], args[1::2]))
+                    conn.sendall(b'+OK\r\n')
+                elif (name == b'HSET'):
+                    fields = self.data.setdefault(args[0], {})
+                    fields.update(zip(args[1::2], args[2::2]))
+                    conn.sendall(b':%d\r\n' % (len(args) // 2))
+                elif (name == b'EXPIRE'):
+                    self.ttls[args[0]] = int(args[1])
+                    conn.sendall(b':1\r\n')
+                else:
+                    conn.sendall(b'-ERR unknown command\r\n')
+        self.listener.close()
+
+
 class TestRandomIO(unittest.TestCase):
 
     def setUp(self):
@@ -89,6 +157,78 @@ class TestRandomIO(unittest.TestCase):
 
         self.assertEqual(s, string_123456)
 
+    def test_backends_crossplatform(self):
+        string_seed1 = b'\t\xb0\xef\xd9\x05p\xe1W\x17\x8a9\xc6!;^6\x1d\xadj\
+\xb4#n\x1d/\x12+\xe6\xb1\x80\xc86\x06I\xc4!\x8b39\x84E\x1d\x14\xdf\x14e\x12\
+\xfa\xf0\r\x1b'
+        string_seed1_1000000 = b'\x0c4\xec\xcf/\x8f\x1f\xb0\x8d\xed:j\x94{4\
+\x93B\xcbn\xb6~36\x95\x92\x8eK\xcf\xdb\xa1\xdc\xab'
+        # crosses the carry from the low to the high 64 bits of the counter
+        string_seed1_carry = b'\xe9\x1c\xf2\x04\xe6=\x00!p\xe6\xc8\xbctI\x85p\
+\x06\x12U\x1d\xa4\x1f\x01\xb0'
+        string_123456_carry = b'\xc3\xcf\x9a\xbd\xd8\xfd\x9a\xa919]\x91f\xd1\
+\xca\xf6\xe9\xf2n\xe5\x8f\xac\x9a&'
+
+        names = RandomIO.backends.available()
+
+        self.assertIn('python', names)
+
+        for name in names:
+            s = RandomIO.RandomIO('seed1', backend=name)
+
+            self.assertEqual(s.backend.name, name)
+            self.assertEqual(s.read(50), string_seed1)
+            self.assertEqual(s.read_at(1000000, 32), string_seed1_1000000)
+            self.assertEqual(s.read_at((2 ** 64 - 2) * 16 + 8, 24),
+                             string_seed1_carry)
+
+            s.seek(1000000)
+
+            self.assertEqual(s.read(32), string_seed1_1000000)
+
+            s = RandomIO.RandomIO(123456, backend=name)
+
+            self.assertEqual(s.read_at(2 ** 32 * 16 + 5, 24),
+                             string_123456_carry)
+
+    def test_backend_unknown(self):
+        with self.assertRaises(ValueError) as ex:
+            RandomIO.RandomIO('seed1', backend='rot13')
+
+        self.assertEqual(str(ex.exception), 'Unknown backend rot13.')
+
+    def test_from_key(self):
+        s1 = RandomIO.RandomIO('seed string')
+        s2 = RandomIO.RandomIO.from_key(s1.key, 1000)
+
+        self.assertEqual(s2.read(), s1.read(1000))
+        self.assertEqual(s2.size, 1000)
+
+    def test_seed_types(self):
+        self.assertEqual(RandomIO.RandomIO(b'123').read(10),
+                         RandomIO.RandomIO('123').read(10))
+        self.assertEqual(RandomIO.RandomIO(123).read(10),
+                         RandomIO.RandomIO('123').read(10))
+        self.assertEqual(RandomIO.RandomIO(bytearray(b'seed')).read(10),
+                         RandomIO.RandomIO(b'seed').read(10))
+        self.assertEqual(RandomIO.RandomIO(True).read(10),
+                         RandomIO.RandomIO('True').read(10))
+        self.assertNotEqual(RandomIO.RandomIO(1).read(10),
+                            RandomIO.RandomIO(True).read(10))
+        self.assertEqual(RandomIO.RandomIO((1, 2)).read(10),
+                         RandomIO.RandomIO('(1, 2)').read(10))
+
+    def test_seed_equal_values(self):
+        # seeds that compare equal but print differently derive their own
+        # keys, whichever was used first
+        RandomIO.RandomIO(0.0)
+        RandomIO.RandomIO((1, 1.0))
+
+        self.assertEqual(RandomIO.RandomIO(-0.0).read(10),
+                         RandomIO.RandomIO('-0.0').read(10))
+        self.assertEqual(RandomIO.RandomIO((1.0, 1)).read(10),
+                         RandomIO.RandomIO('(1.0, 1)').read(10))
+
     def test_read(self):
         s1 = RandomIO.RandomIO('seed string')
 
@@ -124,6 +264,96 @@ class TestRandomIO(unittest.TestCase):
         os.remove(file1)
         os.remove(file2)
 
+    def test_dump_bufsz(self):
+        stream = RandomIO.RandomIO('seed string').read(100000)
+
+        for bufsz in [1, 16, 1000, 65536, 1048576]:
+            f = io.BytesIO()
+            RandomIO.RandomIO('seed string').dump(f, 100000, bufsz=bufsz)
+
+            self.assertEqual(f.getvalue(), stream)
+
+    def test_genfile_preallocate(self):
+        stream = RandomIO.RandomIO('seed string').read(100000)
+
+        path = RandomIO.RandomIO('seed string').genfile(
+            100000, bufsz=4096, preallocate=True)
+
+        with open(path, 'rb') as f:
+            contents = f.read()
+
+        self.assertEqual(contents, stream)
+
+        os.remove(path)
+
+    def test_genfile_resume(self):
+        stream = RandomIO.RandomIO('seed string').read(300000)
+
+        with open('resume_test.out', 'wb') as f:
+            f.write(stream[10:150010] + b'\0' * 100)
+
+        s1 = RandomIO.RandomIO('seed string')
+        s1.chunksz = 65536
+        s1.seek(10)
+        path = s1.genfile(250000, 'resume_test.out', resume=True)
+
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), stream[10:250010])
+        self.assertEqual(s1.tell(), 250010)
+
+        with open(path, 'r+b') as f:
+            f.seek(131000)
+            f.write(b'\0' * 72)
+            f.truncate(200000)
+
+        s2 = RandomIO.RandomIO('seed string')
+        s2.chunksz = 65536
+        s2.seek(10)
+        s2.genfile(250000, path, workers=2, resume=True)
+
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), stream[10:250010])
+        self.assertEqual(s2.tell(), 250010)
+
+        os.remove(path)
+
+    def test_genfile_hash(self):
+        stream = RandomIO.RandomIO('seed string').read(300000)
+
+        f = io.BytesIO()
+        digest = RandomIO.RandomIO('seed string').dump(f, 300000,
+                                                       bufsz=4096,
+                                                       hash='sha256')
+
+        self.assertEqual(f.getvalue(), stream)
+        self.assertEqual(digest, hashlib.sha256(stream).digest())
+
+        md5 = hashlib.md5()
+        digests = RandomIO.RandomIO('seed string').dump(
+            io.BytesIO(), 1000, hash=[md5, hashlib.sha1])
+
+        self.assertEqual(digests, [hashlib.md5(stream[:1000]).digest(),
+                                   hashlib.sha1(stream[:1000]).digest()])
+        self.assertEqual(md5.digest(), digests[0])
+
+        s1 = RandomIO.RandomIO('seed string')
+        s1.seek(10)
+        (path, digest) = s1.genfile(200000, workers=2, hash='sha256')
+
+        self.assertEqual(digest, hashlib.sha256(stream[10:200010]).digest())
+
+        with open(path, 'r+b') as f:
+            f.truncate(100000)
+
+        s2 = RandomIO.RandomIO('seed string')
+        s2.chunksz = 65536
+        s2.seek(10)
+
+        self.assertEqual(s2.genfile(200000, path, resume=True,
+                                    hash='sha256'), (path, digest))
+
+        os.remove(path)
+
     def test_genfile(self):
         path = RandomIO.RandomIO('seed string').genfile(100)
 
@@ -211,12 +441,53 @@ class TestRandomIO(unittest.TestCase):
 
         buf1 = s1.read(10)
 
-        s1.seek(100, os.SEEK_END)
+        s1.seek(-100, os.SEEK_END)
 
         buf2 = s1.read(10)
 
         self.assertEqual(buf1, buf2)
 
+    def test_seek_past_end(self):
+        s1 = RandomIO.RandomIO('seed string', 1000)
+
+        self.assertEqual(s1.seek(10, os.SEEK_END), 1010)
+        self.assertEqual(s1.read(10), b'')
+        self.assertEqual(s1.readinto(bytearray(10)), 0)
+
+        s1.seek(-10, os.SEEK_END)
+
+        self.assertEqual(len(s1.read(100)), 10)
+
+    def test_seek_negative(self):
+        s1 = RandomIO.RandomIO('seed string', 1000)
+
+        with self.assertRaises(ValueError):
+            s1.seek(-5)
+
+        s1.seek(10)
+
+        with self.assertRaises(ValueError):
+            s1.seek(-11, os.SEEK_CUR)
+
+        with self.assertRaises(ValueError):
+            s1.seek(-1001, os.SEEK_END)
+
+        self.assertEqual(s1.tell(), 10)
+
+    def test_closed(self):
+        s1 = RandomIO.RandomIO('seed string')
+
+        s1.close()
+
+        with self.assertRaises(ValueError):
+            s1.read(10)
+
+        with self.assertRaises(ValueError):
+            s1.readinto(bytearray(10))
+
+        with self.assertRaises(ValueError):
+            s1.seek(0)
+
     def test_tell_beginning(self):
         s1 = RandomIO.RandomIO('seed string')
 
@@ -245,6 +516,496 @@ class TestRandomIO(unittest.TestCase):
             str(ex.exception),
             'Cannot seek from end of stream if size is unknown.')
 
+    def test_seek_matches_stream(self):
+        s1 = RandomIO.RandomIO('seed string')
+
+        stream = s1.read(1000)
+
+        for offset in [1, 8, 15, 16, 17, 100, 990]:
+            s1.seek(offset)
+            self.assertEqual(s1.read(10), stream[offset:offset + 10])
+
+    def test_read_ahead(self):
+        stream = RandomIO.RandomIO('seed string').read(100000)
+
+        s1 = RandomIO.RandomIO('seed string')
+        s1.readahead = 256
+        buf = bytearray(10)
+        pos = 0
+        for n in [1, 16, 3, 200, 7, 300, 5, 16, 16, 1000, 2]:
+            self.assertEqual(s1.read(n), stream[pos:pos + n])
+            pos += n
+            s1.readinto(buf)
+            self.assertEqual(bytes(buf), stream[pos:pos + 10])
+            pos += 10
+
+        self.assertEqual(s1.tell(), pos)
+
+        s1.seek(pos - 20)
+
+        self.assertEqual(s1.read(30), stream[pos - 20:pos + 10])
+
+        s1.seek(50000)
+
+        self.assertEqual(s1.read(16), stream[50000:50016])
+        self.assertEqual(len(s1._ahead), 16)
+
+        s2 = RandomIO.RandomIO('seed string', 20)
+        s2.read(1)
+
+        self.assertEqual(s2.read(100), stream[1:20])
+
+    def test_readinto(self):
+        s1 = RandomIO.RandomIO('seed string')
+        s2 = RandomIO.RandomIO('seed string')
+
+        buf = bytearray(100)
+        n = s1.readinto(buf)
+
+        self.assertEqual(n, 100)
+        self.assertEqual(bytes(buf), s2.read(100))
+
+        view = memoryview(bytearray(37))
+        s1.readinto(view)
+
+        self.assertEqual(view.tobytes(), s2.read(37))
+        self.assertEqual(s1.tell(), 137)
+
+    def test_readinto_limit(self):
+        s1 = RandomIO.RandomIO('seed string', 100)
+
+        s1.seek(90)
+
+        buf = bytearray(100)
+
+        self.assertEqual(s1.readinto(buf), 10)
+        self.assertEqual(s1.readinto(buf), 0)
+
+    def test_buffered_reader(self):
+        stream = RandomIO.RandomIO('seed string').read(100000)
+
+        f = io.BufferedReader(RandomIO.RandomIO('seed string', 100000))
+
+        self.assertEqual(f.read(), stream)
+
+        f.seek(5000)
+
+        self.assertEqual(f.read(100), stream[5000:5100])
+
+        self.assertEqual(f.seek(-10, os.SEEK_END), 99990)
+        self.assertEqual(f.read(), stream[99990:])
+
+    def test_read_at(self):
+        s1 = RandomIO.RandomIO('seed string')
+
+        stream = s1.read(100000)
+        s1.seek(50)
+
+        for offset in [0, 7, 16, 1000, 33333]:
+            for size in [1, 64, 4096, 50000]:
+                self.assertEqual(s1.read_at(offset, size),
+                                 stream[offset:offset + size])
+
+        buf = bytearray(1000)
+        s1.readinto_at(12345, buf)
+
+        self.assertEqual(bytes(buf), stream[12345:13345])
+        self.assertEqual(s1.tell(), 50)
+        self.assertEqual(s1.read(10), stream[50:60])
+
+    def test_read_at_limit(self):
+        s1 = RandomIO.RandomIO('seed string', 100)
+
+        self.assertEqual(len(s1.read_at(90, 100)), 10)
+        self.assertEqual(len(s1.read_at(95)), 5)
+        self.assertEqual(s1.read_at(200, 10), bytes())
+
+        with self.assertRaises(ValueError):
+            s1.read_at(-1, 10)
+
+    def test_read_at_threads(self):
+        s1 = RandomIO.RandomIO('seed string')
+
+        stream = s1.read(1000000)
+        offsets = list(range(0, 1000000 - 4096, 9973))
+
+        pool = ThreadPool(4)
+        results = pool.map(lambda offset: s1.read_at(offset, 4096), offsets)
+        pool.close()
+
+        for offset, result in zip(offsets, results):
+            self.assertEqual(result, stream[offset:offset + 4096])
+
+    def test_read_parallel(self):
+        stream = RandomIO.RandomIO('seed string').read(1000000)
+
+        s1 = RandomIO.RandomIO('seed string')
+        s1.chunksz = 65536
+        s1.seek(333)
+
+        self.assertEqual(s1.read(900000, workers=4), stream[333:900333])
+        self.assertEqual(s1.tell(), 900333)
+        self.assertEqual(s1.read(10), stream[900333:900343])
+
+    def test_dump_parallel(self):
+        stream = RandomIO.RandomIO('seed string').read(1000000)
+
+        s1 = RandomIO.RandomIO('seed string')
+        s1.chunksz = 65536
+
+        f = io.BytesIO()
+        s1.dump(f, 1000000, workers=4)
+
+        self.assertEqual(f.getvalue(), stream)
+
+        for name in RandomIO.backends.available():
+            if (name == 'python'):
+                continue
+            s2 = RandomIO.RandomIO('seed string', backend=name)
+            s2.chunksz = 65536
+            s2.seek(10)
+            path = s2.genfile(900000, workers=4)
+
+            with open(path, 'rb') as f:
+                contents = f.read()
+
+            self.assertEqual(contents, stream[10:900010])
+            self.assertEqual(s2.tell(), 900010)
+
+            os.remove(path)
+
+    def test_cache(self):
+        stream = RandomIO.RandomIO('seed string').read(100000)
+
+        cache = RandomIO.KeystreamCache(maxbytes=16384, blocksz=4096)
+        s1 = RandomIO.RandomIO('seed string', cache=cache)
+
+        s1.seek(5000)
+
+        self.assertEqual(s1.read(100), stream[5000:5100])
+
+        s1.seek(5050)
+
+        self.assertEqual(s1.read(10000), stream[5050:15050])
+        self.assertEqual(s1.tell(), 15050)
+
+        buf = bytearray(50)
+        s1.readinto(buf)
+
+        self.assertEqual(bytes(buf), stream[15050:15100])
+
+        s1.seek(90000)
+
+        self.assertEqual(s1.read(100), stream[90000:90100])
+
+        s1.seek(50000)
+
+        self.assertEqual(s1.read(100), stream[50000:50100])
+
+        stats = cache.stats()
+
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 5)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['blocks'], 4)
+
+    def test_cache_shared(self):
+        cache = RandomIO.KeystreamCache()
+        s1 = RandomIO.RandomIO('seed string', cache=cache)
+        s2 = RandomIO.RandomIO('seed string', cache=cache)
+        s3 = RandomIO.RandomIO('another seed', cache=cache)
+
+        self.assertEqual(s1.read(100), s2.read(100))
+        self.assertNotEqual(s1.read(100), s3.read(100))
+        self.assertEqual(cache.stats()['hits'], 2)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+        s4 = RandomIO.RandomIO('seed string', cache=True)
+
+        self.assertIs(s4.cache, RandomIO.cache.shared())
+        self.assertIsNone(RandomIO.RandomIO('seed string').cache)
+
+    def test_random_numbers(self):
+        s1 = RandomIO.RandomIO('seed string')
+        stream = RandomIO.RandomIO('seed string').read(16)
+
+        self.assertEqual(list(s1.random_raw(2)),
+                         [2690070774576051436, 7955936659795914442])
+        self.assertEqual(
+            int.from_bytes(stream[8:16], 'little'), 7955936659795914442)
+        self.assertEqual(s1.tell(), 16)
+
+        self.assertEqual(RandomIO.RandomIO('seed string').randints(
+            5, -10, 10), [6, -8, 6, -1, 6])
+        self.assertEqual(RandomIO.RandomIO('seed string').random_floats(2),
+                         [0.14582902889675586, 0.4312921905353898])
+        self.assertEqual(RandomIO.RandomIO('seed string').choice(
+            'abcdef', 5), ['e', 'e', 'c', 'd', 'c'])
+
+        items = list(range(10))
+        RandomIO.RandomIO('seed string').shuffle(items)
+
+        self.assertEqual(items, [4, 9, 7, 5, 8, 2, 3, 0, 1, 6])
+
+        values = RandomIO.RandomIO('seed string').randints(30000, 0, 3)
+
+        self.assertEqual(set(values), set([0, 1, 2]))
+        for v in range(3):
+            self.assertLess(abs(values.count(v) - 10000), 500)
+
+        s2 = RandomIO.RandomIO('seed string', 20)
+
+        self.assertRaises(RuntimeError, s2.random_raw, 3)
+        self.assertRaises(ValueError, s1.randints, 1, 0, 2 ** 65)
+
+    def test_digest(self):
+        s1 = RandomIO.RandomIO('seed string')
+
+        stream = s1.read(300000)
+
+        self.assertEqual(s1.digest(size=300000),
+                         hashlib.sha256(stream).digest())
+        self.assertEqual(s1.digest('md5', 1234, 100000, chunk=4096),
+                         hashlib.md5(stream[1234:101234]).digest())
+        self.assertEqual(s1.digest(hashlib.sha1, 7, 0),
+                         hashlib.sha1().digest())
+        self.assertEqual(s1.tell(), 300000)
+
+        s2 = RandomIO.RandomIO('seed string', 300000)
+
+        self.assertEqual(s2.digest(offset=1000),
+                         hashlib.sha256(stream[1000:]).digest())
+
+    def test_digest_many(self):
+        items = [(b'seed one', 100000), ('seed two', 10), (3, 0)]
+        expected = [hashlib.sha256(RandomIO.RandomIO(seed).read(size)).digest()
+                    for (seed, size) in items]
+
+        self.assertEqual(RandomIO.RandomIO.digest_many(items, workers=1),
+                         expected)
+        self.assertEqual(RandomIO.RandomIO.digest_many(items, workers=2),
+                         expected)
+
+    def test_batch_read(self):
+        seeds = [b'seed one', 'seed two', 3, b'seed one']
+
+        rows = RandomIO.RandomIO.batch_read(seeds, 100)
+
+        self.assertEqual(rows.shape, (4, 100))
+        self.assertEqual(rows.tolist()[2],
+                         list(RandomIO.RandomIO(3).read(100)))
+
+        flat = rows.cast('B')
+        for (i, seed) in enumerate(seeds):
+            self.assertEqual(flat[i * 100:(i + 1) * 100].tobytes(),
+                             RandomIO.RandomIO(seed).read(100))
+
+        offsets = [0, 7, 16, 100000]
+        for workers in (1, 2):
+            rows = RandomIO.RandomIO.batch_read_at(seeds, offsets, 1000,
+                                                   workers=workers)
+            flat = rows.cast('B')
+            for (i, seed) in enumerate(seeds):
+                self.assertEqual(flat[i * 1000:(i + 1) * 1000].tobytes(),
+                                 RandomIO.RandomIO(seed).read_at(offsets[i],
+                                                                 1000))
+
+        self.assertEqual(len(RandomIO.RandomIO.batch_read([], 100)), 0)
+        self.assertRaises(ValueError, RandomIO.RandomIO.batch_read_at,
+                          seeds, [0], 100)
+
+    def test_pool(self):
+        seeds = [b'seed one', 'seed two', 3]
+        streams = [RandomIO.RandomIO(seed) for seed in seeds]
+        for ahead in (0, 16, 256):
+            pool = RandomIO.RandomIOPool(seeds, ahead=ahead)
+            self.assertEqual(len(pool), 3)
+            for size in (1, 5, 16, 17, 100, 2000, 7):
+                for (i, s) in enumerate(streams):
+                    s.seek(pool.tell(i))
+                    self.assertEqual(pool.read(i, size), s.read(size))
+                rows = pool.read_many([2, 0, 1], size)
+                self.assertEqual(rows.shape, (3, size))
+                for (row, i) in zip(rows.tolist(), [2, 0, 1]):
+                    streams[i].seek(pool.tell(i) - size)
+                    self.assertEqual(bytes(row), streams[i].read(size))
+
+            self.assertEqual(pool.seek(1, -10, os.SEEK_CUR),
+                             streams[1].seek(-10, os.SEEK_CUR))
+            self.assertEqual(pool.read(1, 30), streams[1].read(30))
+
+        index = pool.add(b'seed one', 1000)
+        self.assertEqual(pool.read(index, 10),
+                         RandomIO.RandomIO(b'seed one').read_at(1000, 10))
+        self.assertEqual(pool.key(index), pool.key(0))
+        self.assertEqual(pool.stream(index).read(10),
+                         RandomIO.RandomIO(b'seed one').read_at(1010, 10))
+
+        pool = RandomIO.RandomIOPool(seeds, size=10)
+        self.assertEqual(pool.read(0, 4) + pool.read(0),
+                         RandomIO.RandomIO(b'seed one').read(10))
+        self.assertEqual(pool.read(0, 5), b'')
+        pool.seek(1, -3, os.SEEK_END)
+        self.assertEqual(pool.read_many([1], 5).tobytes(),
+                         RandomIO.RandomIO('seed two').read_at(7, 3) +
+                         bytes(2))
+        self.assertEqual(pool.read(2, 0), b'')
+        self.assertEqual(len(pool.read_many([0, 1], 0)), 0)
+        self.assertRaises(RuntimeError, RandomIO.RandomIOPool([1]).read, 0)
+        self.assertRaises(ValueError, pool.seek, 0, -1)
+        self.assertRaises(ValueError, pool.add_key, b'short')
+
+    def test_view(self):
+        s1 = RandomIO.RandomIO('seed string')
+        stream = s1.read(20000)
+
+        v1 = s1.view(20000, pagesz=1024, pages=4)
+
+        self.assertEqual(len(v1), 20000)
+        self.assertEqual(v1[0], stream[0])
+        self.assertEqual(v1[-1], stream[-1])
+        self.assertEqual(v1[100:200], stream[100:200])
+        self.assertEqual(v1[150:160], stream[150:160])
+        self.assertEqual(v1[-5000:], stream[-5000:])
+        self.assertEqual(v1[10:9000:7], stream[10:9000:7])
+        self.assertEqual(v1[9000:10:-3], stream[9000:10:-3])
+        self.assertEqual(v1[30000:], b'')
+        self.assertEqual(bytes(v1), stream)
+        self.assertRaises(IndexError, lambda: v1[20000])
+        self.assertEqual(s1.tell(), 20000)
+        self.assertEqual(v1.cache.stats()['hits'], 2)
+
+        buf = bytearray(100)
+
+        self.assertEqual(v1.readinto(19950, buf), 50)
+        self.assertEqual(bytes(buf[:50]), stream[19950:])
+
+        v2 = RandomIO.RandomIO('seed string').view(2 ** 40)
+
+        self.assertEqual(len(v2), 2 ** 40)
+        self.assertEqual(v2[2 ** 40 - 10:],
+                         RandomIO.RandomIO('seed string').read_at(
+                             2 ** 40 - 10, 10))
+        self.assertRaises(RuntimeError, RandomIO.RandomIO().view)
+
+    def test_view_strided(self):
+        s1 = RandomIO.RandomIO('seed string')
+        v1 = s1.view(2 ** 40)
+
+        tracemalloc.start()
+        try:
+            wide = v1[0:400 * 2 ** 20:2 ** 20]
+            narrow = v1[0:16 * 2 ** 20:4096]
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        # only the touched bytes, or a chunk at a time, are generated
+        self.assertLess(peak, 4 * 2 ** 20)
+        self.assertEqual(wide, bytes(s1.read_at(i, 1)[0] for i in
+                                     range(0, 400 * 2 ** 20, 2 ** 20)))
+        self.assertEqual(narrow, bytes(s1.read_at(i, 1)[0] for i in
+                                       range(0, 16 * 2 ** 20, 4096)))
+        self.assertEqual(len(v1[::2 ** 30]), 1024)
+        self.assertEqual(v1[::-2 ** 30][-1], v1[2 ** 30 - 1])
+
+    def test_merkle(self):
+        s1 = RandomIO.RandomIO('seed string', 100000)
+        stream = s1.read()
+
+        tree = RandomIO.MerkleTree(s1, leafsz=1000, span=4)
+
+        self.assertEqual(tree.count, 100)
+
+        for (offset, size) in [(0, 1), (1500, 10), (2999, 2), (0, 100000),
+                               (99999, 1), (37000, 21000)]:
+            proof = tree.prove(offset, size)
+            data = stream[proof.offset:proof.offset + proof.size]
+
+            self.assertLessEqual(proof.offset, offset)
+            self.assertGreaterEqual(proof.offset + proof.size, offset + size)
+            self.assertTrue(tree.verify(data, proof))
+            self.assertTrue(RandomIO.merkle.verify(tree.root, data, proof,
+                                                   100000, 1000))
+            self.assertFalse(tree.verify(b'\0' + data[1:], proof))
+            self.assertFalse(tree.verify(data, proof._replace(
+                offset=(proof.offset + 1000) % 100000)))
+
+        self.assertRaises(ValueError, tree.prove, 99999, 2)
+
+        parallel = RandomIO.MerkleTree(s1, leafsz=1000, span=4, workers=2)
+
+        self.assertEqual(parallel.root, tree.root)
+
+    def test_metrics(self):
+        calls = []
+        RandomIO.metrics.reset()
+        RandomIO.metrics.enable()
+        RandomIO.metrics.add_callback(lambda op, seconds: calls.append(op))
+        try:
+            s1 = RandomIO.RandomIO('seed string',
+                                   cache=RandomIO.KeystreamCache())
+            s1.read(100)
+            s1.seek(0)
+            s1.read(100)
+            s2 = RandomIO.RandomIO('seed string')
+            s2.read_at(1000000, 10)
+            s2.dump(io.BytesIO(), 10000, bufsz=4096)
+        finally:
+            RandomIO.metrics.disable()
+            del RandomIO.metrics._callbacks[:]
+
+        stats = RandomIO.RandomIO.stats()
+        counters = stats['counters']
+        operations = stats['operations']
+
+        self.assertEqual(counters['cache_hits'], 1)
+        self.assertEqual(counters['cache_misses'], 1)
+        # three of the dump() buffer, and the read-ahead buffer for the
+        # last 1808 bytes
+        self.assertEqual(counters['refills'], 4)
+        self.assertEqual(operations['read']['count'], 2)
+        self.assertEqual(operations['seek']['count'], 1)
+        self.assertEqual(operations['readinto']['count'], 3)
+        self.assertEqual(operations['write']['bytes'], 10000)
+        self.assertEqual(operations['cipher']['bytes'], 4096 + 10 + 10000)
+        self.assertEqual(sum(operations['dump']['histogram']), 1)
+        self.assertEqual(calls.count('read'), 2)
+
+        RandomIO.RandomIO('seed string').read(100)
+
+        self.assertEqual(RandomIO.RandomIO.stats(), stats)
+
+        RandomIO.metrics.reset()
+
+    def test_metrics_read_ahead_refills(self):
+        RandomIO.metrics.reset()
+        RandomIO.metrics.enable()
+        try:
+            s1 = RandomIO.RandomIO('seed string')
+            for i in range(1000):
+                s1.read(16)
+        finally:
+            RandomIO.metrics.disable()
+
+        counters = RandomIO.RandomIO.stats()['counters']
+
+        # the window grows from 16 bytes to 4096, so 16000 bytes take 11
+        self.assertEqual(counters['refills'], 11)
+
+        RandomIO.metrics.reset()
+
+    def test_lazy_import(self):
+        code = ('import sys, RandomIO; '
+                'print(sorted(m for m in ["asyncio", "multiprocessing", '
+                '"numpy", "socket", "RandomIO.merkle"] '
+                'if m in sys.modules)); '
+                'RandomIO.MerkleTree; '
+                'print("RandomIO.merkle" in sys.modules)')
+        output = subprocess.check_output(
+            [sys.executable, '-c', code]).decode('ascii').split()
+        self.assertEqual(output, ['[]', 'True'])
+
     def test_iotools_txt(self):
         output = 'txt_test.out'
         size = 10485760
@@ -261,6 +1022,304 @@ class TestRandomIO(unittest.TestCase):
                 self.assertEqual(hash, testhash)
         os.remove(output)
 
+    def test_iotools_jobs(self):
+        output = 'jobs_test.out'
+        size = 3000000
+        subprocess.call(
+            iotools_call + ['pairgen', str(size),
+                            '-p', '6', '-j', '3', '-o', output])
+
+        with open(output, 'r') as pairsfile:
+            lines = pairsfile.readlines()
+
+        self.assertEqual(len(lines), 6)
+        for line in lines:
+            (hexseed, hash) = line.rstrip().split(' ')
+            seed = binascii.unhexlify(hexseed)
+            testhash = hashlib.sha256(
+                RandomIO.RandomIO(seed).read(size)).hexdigest()
+            self.assertEqual(hash, testhash)
+        os.remove(output)
+
+    def test_pair_store(self):
+        path = 'store_test.out'
+        seeds = [os.urandom(i % 12 + 1) for i in range(100)]
+        with RandomIO.PairStoreWriter(path, 12, len(seeds)) as writer:
+            for seed in seeds:
+                writer.add(seed, hashlib.sha256(seed).digest())
+
+        with RandomIO.PairStore(path) as store:
+            self.assertEqual(len(store), 100)
+            for seed in seeds:
+                self.assertIn(seed, store)
+                self.assertEqual(store.get(seed),
+                                 hashlib.sha256(seed).digest())
+            self.assertNotIn(b'missing', store)
+            self.assertIsNone(store.get(b'x' * 13))
+
+            self.assertEqual(store.take(seeds[0]),
+                             hashlib.sha256(seeds[0]).digest())
+            self.assertIsNone(store.take(seeds[0]))
+            self.assertTrue(store.used(seeds[0]))
+            self.assertEqual(store.pop(),
+                             (seeds[1], hashlib.sha256(seeds[1]).digest()))
+
+        with RandomIO.PairStore(path) as store:
+            self.assertTrue(store.used(seeds[1]))
+            popped = [store.pop()[0] for i in range(98)]
+            self.assertEqual(popped, seeds[2:])
+            with self.assertRaises(KeyError):
+                store.pop()
+
+        with self.assertRaises(ValueError):
+            with RandomIO.PairStoreWriter(path, 12, 2) as writer:
+                writer.add(b'seed', bytes(32))
+        with self.assertRaises(KeyError):
+            with RandomIO.PairStoreWriter(path, 12, 2) as writer:
+                writer.add(b'seed', bytes(32))
+                raise KeyError('interrupted')
+        self.assertFalse(os.path.exists(path + '.tmp'))
+        with RandomIO.PairStore(path) as store:
+            self.assertEqual(len(store), 100)
+
+        with open(path, 'r+b') as f:
+            f.truncate(1000)
+        with self.assertRaises(ValueError):
+            RandomIO.PairStore(path)
+
+        # a file that is not a store is closed again, not leaked
+        with open(path, 'wb') as f:
+            f.write(bytes(1000))
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', ResourceWarning)
+            with self.assertRaises(ValueError):
+                RandomIO.PairStore(path)
+            gc.collect()
+        self.assertEqual([w for w in caught
+                          if issubclass(w.category, ResourceWarning)], [])
+        os.remove(path)
+
+    def test_iotools_store(self):
+        output = 'store_test.out'
+        size = 100000
+        subprocess.call(
+            iotools_call + ['pairgen', str(size),
+                            '-p', '10', '-o', output, '--store'])
+
+        with RandomIO.PairStore(output, writable=False) as store:
+            self.assertEqual(len(store), 10)
+            with open(output, 'rb') as f:
+                f.seek(64)
+                for i in range(10):
+                    record = f.read(1 + 12 + 32 + 1)
+                    seed = record[1:1 + record[0]]
+                    self.assertEqual(store.get(seed), hashlib.sha256(
+                        RandomIO.RandomIO(seed).read(size)).digest())
+        os.remove(output)
+
+    def test_iotools_genfiles(self):
+        output = 'genfiles_test.out'
+        os.mkdir('genfiles_test')
+        subprocess.call(
+            iotools_call + ['genfiles', '-n', '5', '-s', '1000',
+                            '-x', '300000', '-d', 'genfiles_test',
+                            '-j', '2', '-c', '1', '-o', output])
+
+        with open(output, 'r') as indexfile:
+            lines = indexfile.readlines()
+
+        self.assertEqual(len(lines), 5)
+        for line in lines:
+            (hexseed, path, hash) = line.rstrip().split(' ')
+            with open(path, 'rb') as f:
+                contents = f.read()
+            self.assertEqual(contents, RandomIO.RandomIO(
+                binascii.unhexlify(hexseed)).read(len(contents)))
+            self.assertEqual(hash, hashlib.sha256(contents).hexdigest())
+            os.remove(path)
+        os.rmdir('genfiles_test')
+        os.remove(output)
+
+    def test_redis_writer(self):
+        pairs = [('{0:04x}'.format(i), '{0:064x}'.format(i))
+                 for i in range(25)]
+        expected = dict((k.encode(), v.encode()) for (k, v) in pairs)
+
+        for (layout, ttl) in [('set', None), ('set', 60), ('mset', None),
+                              ('mset', 60), ('hset', None), ('hset', 60)]:
+            server = RedisStandIn()
+            with RandomIO.RedisWriter(
+                    RandomIO.resp.connect('127.0.0.1', server.port),
+                    layout, ttl=ttl, batch=10) as writer:
+                for (seed, hash) in pairs:
+                    writer.add(seed, hash)
+            server.join(5)
+            if (layout == 'hset'):
+                self.assertEqual(server.data, {b'pairs': expected})
+                keys = [b'pairs']
+            else:
+                self.assertEqual(server.data, expected)
+                keys = list(expected)
+            if (ttl is None):
+                self.assertEqual(server.ttls, {})
+            else:
+                self.assertEqual(server.ttls, dict.fromkeys(keys, ttl))
+
+        out = io.BytesIO()
+        writer = RandomIO.RedisWriter(out, 'mset', batch=10)
+        out.close = lambda: None
+        with writer:
+            for (seed, hash) in pairs:
+                writer.add(seed, hash)
+        out.seek(0)
+        commands = list(resp_commands(out))
+        self.assertEqual([len(c) for c in commands], [21, 21, 11])
+        self.assertEqual(dict(zip(sum((c[1::2] for c in commands), []),
+                                  sum((c[2::2] for c in commands), []))),
+                         expected)
+
+        server = RedisStandIn(readonly=True)
+        with self.assertRaises(IOError):
+            with RandomIO.RedisWriter(
+                    RandomIO.resp.connect('127.0.0.1', server.port)) as writer:
+                writer.add(*pairs[0])
+
+        with self.assertRaises(ValueError):
+            RandomIO.RedisWriter(io.BytesIO(), 'append')
+
+    def test_iotools_redis_pipe(self):
+        size = 100000
+        server = RedisStandIn()
+        subprocess.call(
+            iotools_call + ['pairgen', str(size), '-p', '10',
+                            '--host', '127.0.0.1', '--port', str(server.port),
+                            '--layout', 'hset', '--key', 'uptick'])
+        server.join(5)
+
+        self.assertEqual(len(server.data[b'uptick']), 10)
+        for (hexseed, hash) in server.data[b'uptick'].items():
+            seed = binascii.unhexlify(hexseed)
+            self.assertEqual(hash.decode('ascii'), hashlib.sha256(
+                RandomIO.RandomIO(seed).read(size)).hexdigest())
+
+        output = 'redis_test.out'
+        subprocess.call(
+            iotools_call + ['pairgen', str(size), '-p', '10', '-o', output,
+                            '--redis', '--ttl', '3600'])
+        with open(output, 'rb') as f:
+            commands = list(resp_commands(f))
+        self.assertEqual(len(commands), 10)
+        for (name, hexseed, hash, ex, ttl) in commands:
+            self.assertEqual((name, ex, ttl), (b'SET', b'EX', b'3600'))
+            seed = binascii.unhexlify(hexseed)
+            self.assertEqual(hash.decode('ascii'), hashlib.sha256(
+                RandomIO.RandomIO(seed).read(size)).hexdigest())
+        os.remove(output)
+
+    @unittest.skipIf(_platform == 'win32', 'needs Unix sockets')
+    def test_default_socket(self):
+        base = tempfile.mkdtemp()
+        runtime = os.environ.pop('XDG_RUNTIME_DIR', None)
+        tempdir = tempfile.tempdir
+        tempfile.tempdir = base
+        try:
+            path = RandomIO.daemon.default_socket()
+            private = os.path.dirname(path)
+
+            self.assertEqual(os.path.dirname(private), base)
+            self.assertEqual(os.stat(private).st_mode & 0o777, 0o700)
+
+            os.environ['XDG_RUNTIME_DIR'] = private
+            self.assertEqual(RandomIO.daemon.default_socket(),
+                             os.path.join(private, 'randomio.sock'))
+
+            # a directory others can use is not trusted
+            os.chmod(private, 0o755)
+            del os.environ['XDG_RUNTIME_DIR']
+            self.assertRaises(OSError, RandomIO.daemon.default_socket)
+        finally:
+            tempfile.tempdir = tempdir
+            os.environ.pop('XDG_RUNTIME_DIR', None)
+            if (runtime is not None):
+                os.environ['XDG_RUNTIME_DIR'] = runtime
+            shutil.rmtree(base)
+
+    @unittest.skipIf(_platform == 'win32', 'needs Unix sockets')
+    def test_daemon(self):
+        path = 'daemon_test.sock'
+        server = RandomIO.daemon.Server(path, jobs=2)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+            results = list(RandomIO.daemon.request(
+                {'op': 'pairgen', 'size': 10000, 'pairs': 5}, path))
+            self.assertEqual(len(results), 5)
+            for result in results:
+                seed = binascii.unhexlify(result['seed'])
+                self.assertEqual(len(seed), 12)
+                self.assertEqual(result['hash'], hashlib.sha256(
+                    RandomIO.RandomIO(seed).read(10000)).hexdigest())
+
+            results = list(RandomIO.daemon.request(
+                {'op': 'digest', 'size': 100, 'seeds': ['00ff', '0102'],
+                 'algorithm': 'md5', 'backend': 'python'}, path))
+            self.assertEqual(results, [
+                {'seed': seed, 'hash': hashlib.md5(RandomIO.RandomIO(
+                    binascii.unhexlify(seed)).read(100)).hexdigest()}
+                for seed in ['00ff', '0102']])
+
+            with self.assertRaises(IOError):
+                list(RandomIO.daemon.request({'op': 'unknown'}, path))
+            with self.assertRaises(IOError):
+                list(RandomIO.daemon.request(
+                    {'op': 'digest', 'size': 100, 'seeds': ['zz']}, path))
+            with self.assertRaises(OSError):
+                RandomIO.daemon.Server(path)
+
+            output = subprocess.check_output(
+                iotools_call + ['client', '-s', path, 'genfile', '5000',
+                                'daemon_test.out', '--seed', 'abcd'])
+            (hexseed, filepath, hash) = output.decode('ascii').split()
+            with open('daemon_test.out', 'rb') as f:
+                contents = f.read()
+            self.assertEqual((hexseed, filepath),
+                             ('abcd', os.path.abspath('daemon_test.out')))
+            self.assertEqual(contents, RandomIO.RandomIO(
+                binascii.unhexlify('abcd')).read(5000))
+            self.assertEqual(hash, hashlib.sha256(contents).hexdigest())
+            os.remove('daemon_test.out')
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+        self.assertFalse(os.path.exists(path))
+
+    @unittest.skipIf(_platform == 'win32', 'needs Unix sockets')
+    def test_iotools_serve(self):
+        path = 'serve_test.sock'
+        server = subprocess.Popen(
+            iotools_call + ['serve', '-s', path, '-j', '1', '-v'],
+            stdout=subprocess.PIPE)
+        try:
+            # the server says when it is listening
+            server.stdout.readline()
+            output = subprocess.check_output(
+                iotools_call + ['client', '-s', path, 'pairgen', '1000',
+                                '-p', '3'])
+        finally:
+            server.terminate()
+            server.wait()
+            server.stdout.close()
+
+        lines = output.decode('ascii').splitlines()
+        self.assertEqual(len(lines), 3)
+        for line in lines:
+            (hexseed, hash) = line.split(' ')
+            self.assertEqual(hash, hashlib.sha256(RandomIO.RandomIO(
+                binascii.unhexlify(hexseed)).read(1000)).hexdigest())
+        self.assertFalse(os.path.exists(path))
+
     def test_iotools_redis(self):
         r = redis.StrictRedis(host='localhost', port=6379, db=0)
         output = 'redis_test.out'
@@ -280,5 +1339,69 @@ class TestRandomIO(unittest.TestCase):
         os.remove(output)
         r.flushall()
 
+
+class TestAsyncRandomIO(unittest.TestCase):
+
+    def run_async(self, coro):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    def test_read_seek(self):
+        stream = RandomIO.RandomIO('seed string').read(3000000)
+
+        async def go():
+            s = RandomIO.AsyncRandomIO('seed string', chunk=65536)
+            first = await s.read(3000000)
+            await s.seek(12345)
+            second = await s.read(100)
+            return (first, second, s.tell())
+
+        (first, second, offset) = self.run_async(go())
+
+        self.assertEqual(first, stream)
+        self.assertEqual(second, stream[12345:12445])
+        self.assertEqual(offset, 12445)
+
+    def test_iter_chunks(self):
+        stream = RandomIO.RandomIO('seed string').read(10000)
+
+        async def go():
+            s = RandomIO.AsyncRandomIO('seed string', 10000)
+            return [chunk async for chunk in s.iter_chunks(3000)]
+
+        chunks = self.run_async(go())
+
+        self.assertEqual([len(c) for c in chunks], [3000, 3000, 3000, 1000])
+        self.assertEqual(b''.join(chunks), stream)
+
+    def test_dump_async(self):
+        stream = RandomIO.RandomIO('seed string').read(100000)
+
+        class Writer(object):
+
+            def __init__(self):
+                self.data = []
+                self.drains = 0
+
+            def write(self, data):
+                self.data.append(data)
+
+            async def drain(self):
+                self.drains += 1
+
+        writer = Writer()
+
+        async def go():
+            s = RandomIO.AsyncRandomIO('seed string', chunk=4096)
+            await s.dump_async(writer, 100000)
+
+        self.run_async(go())
+
+        self.assertEqual(b''.join(writer.data), stream)
+        self.assertEqual(writer.drains, len(writer.data))
+
 if __name__ == '__main__':
     unittest.main()